@@ -0,0 +1,118 @@
+# blog/archive.py
+# The article archive: newest-first listings paged by a (published, id)
+# cursor, and per-month article counts kept in ArticleMonthCount.
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import Article, ArticleMonthCount
+
+# number of articles shown per archive page
+ARCHIVE_PAGE_SIZE = 20
+
+
+def article_month(published):
+    '''Return the (year, month) an article was published in, in the site's time zone.'''
+    local = timezone.localtime(published)
+    return local.year, local.month
+
+
+def month_bounds(year, month):
+    '''Return the aware datetimes at which a month starts and the next one starts.'''
+    zone = timezone.get_current_timezone()
+    start = datetime(year, month, 1, tzinfo=zone)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=zone)
+    return start, end
+
+
+def add_to_month_count(month, delta):
+    '''Add delta (+1 or -1) to the article count of a (year, month).'''
+    year, month = month
+    ArticleMonthCount.objects.bulk_create([ArticleMonthCount(year=year, month=month)], ignore_conflicts=True)
+    ArticleMonthCount.objects.filter(year=year, month=month).update(count=F('count') + delta)
+
+
+def rebuild_month_counts():
+    '''Recount the articles of every month from the Article table.
+
+    Returns:
+        int: Number of months with articles
+    '''
+    counts = (Article.objects.annotate(year=ExtractYear('published'), month=ExtractMonth('published'))
+              .values('year', 'month').annotate(count=Count('id')).order_by())
+    ArticleMonthCount.objects.all().delete()
+    rows = ArticleMonthCount.objects.bulk_create(
+        [ArticleMonthCount(year=row['year'], month=row['month'], count=row['count']) for row in counts]
+    )
+    return len(rows)
+
+
+def archive_months(year=None):
+    '''Return the ArticleMonthCount rows with articles, newest first, optionally for one year.'''
+    months = ArticleMonthCount.objects.filter(count__gt=0)
+    if year is not None:
+        months = months.filter(year=year)
+    return list(months.order_by('-year', '-month'))
+
+
+def archive_years(months=None):
+    '''Return [(year, number of articles)] for every year with articles, newest first.
+
+    Sums `months` (rows from archive_months()) if given, to save a query.
+    '''
+    years = {}
+    for month in archive_months() if months is None else months:
+        years[month.year] = years.get(month.year, 0) + month.count
+    return list(years.items())
+
+
+def encode_cursor(article):
+    '''Encode an article's archive position (published, id) as an opaque URL-safe string.'''
+    raw = json.dumps([article.published.isoformat(), article.pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    '''Decode a cursor from encode_cursor(); returns (published, id) or None if malformed.'''
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        published, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(published), int(pk)
+    except (binascii.Error, ValueError, TypeError, UnicodeError):
+        return None
+
+
+def archive_page(queryset=None, start=None, end=None, cursor=None, limit=ARCHIVE_PAGE_SIZE):
+    '''Return one page of articles, newest first, optionally published in [start, end).
+
+    The page after `cursor` is read with an index range scan on
+    (published, id), so deep pages cost the same as the first.
+
+    Returns:
+        tuple: (list of Article, next_cursor or None if this is the last page)
+    '''
+    articles = Article.objects.all() if queryset is None else queryset
+    if start is not None:
+        articles = articles.filter(published__gte=start)
+    if end is not None:
+        articles = articles.filter(published__lt=end)
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        published, pk = position
+        # the redundant published bound lets the database seek into the index
+        articles = articles.filter(published__lte=published).filter(
+            Q(published__lt=published) | Q(published=published, id__lt=pk)
+        )
+
+    page = list(articles.order_by('-published', '-id')[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
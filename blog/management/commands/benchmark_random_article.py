@@ -0,0 +1,68 @@
+# File: benchmark_random_article.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Compares random article selection strategies on a large synthetic table.
+
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from blog.models import ARTICLE_ID_RANGE_CACHE_KEY, Article, random_article
+
+
+class Command(BaseCommand):
+    """Time random_article() against random.choice(Article.objects.all()).
+    
+    Synthetic articles are inserted with a share of the ids skipped, to
+    leave gaps, inside a transaction that is rolled back at the end,
+    so existing data is left untouched.
+    
+    Usage: python manage.py benchmark_random_article --articles 1000000
+    """
+    help = 'Benchmark random article selection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=1_000_000)
+        parser.add_argument('--gaps', type=float, default=0.3, help='share of ids left unused')
+        parser.add_argument('--samples', type=int, default=200)
+        parser.add_argument('--full-scan-samples', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Inserting {options['articles']} articles...")
+            self.seed(options['articles'], options['gaps'])
+            cache.delete(ARTICLE_ID_RANGE_CACHE_KEY)
+
+            self.report('random.choice(all)', options['full_scan_samples'],
+                        lambda: random.choice(Article.objects.all()))
+            self.report('random_article()', options['samples'], random_article)
+
+            cache.delete(ARTICLE_ID_RANGE_CACHE_KEY)
+            transaction.set_rollback(True)
+
+    def seed(self, articles, gaps, batch_size=10000):
+        """Insert articles with explicit ids, skipping a random share of ids to leave gaps."""
+        user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+        first = (Article.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        span = int(articles / (1 - gaps))
+        ids = sorted(random.Random(412).sample(range(first, first + span), articles))
+        Article.objects.bulk_create(
+            (Article(pk=pk, title=f'Title {pk}', author='Benchmark', text='Lorem ipsum', user=user)
+             for pk in ids),
+            batch_size=batch_size,
+        )
+
+    def report(self, label, samples, pick):
+        """Run pick() `samples` times and print the median and maximum latency."""
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            pick()
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(f'{label:>20}: median {statistics.median(timings):10.3f} ms, '
+                          f'max {max(timings):10.3f} ms ({samples} samples)')
@@ -0,0 +1,23 @@
+# File: rebuild_article_archive.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Recounts the articles of every month for the blog archive.
+
+from django.core.management.base import BaseCommand
+
+from blog.archive import rebuild_month_counts
+
+
+class Command(BaseCommand):
+    """Rebuild the ArticleMonthCount rows from the Article table.
+    
+    Needed once for articles written before the archive existed, or after
+    writing articles without signals (e.g. bulk_create); otherwise the
+    counts are kept up to date as articles change.
+    
+    Usage: python manage.py rebuild_article_archive
+    """
+    help = 'Rebuild the monthly article counts of the blog archive'
+
+    def handle(self, *args, **options):
+        months = rebuild_month_counts()
+        self.stdout.write(f'Counted articles in {months} months')
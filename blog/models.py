@@ -1,7 +1,26 @@
+import math
+import random
+
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Count, Max, Min
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from django.urls import reverse
 from django.contrib.auth.models import User
 
+from cs412.page_cache import purge_page_tags_on_commit
+
+# cache key and lifetime (seconds) of the Article id range and count
+ARTICLE_ID_RANGE_CACHE_KEY = 'blog:article_id_range'
+ARTICLE_ID_RANGE_TIMEOUT = 60 * 60
+
+# random_article() draws enough ids that all of them miss (land in gaps)
+# with at most this probability, but never more than MAX_RANDOM_PROBES
+RANDOM_MISS_PROBABILITY = 0.001
+MAX_RANDOM_PROBES = 1000
+
 
 class Article(models.Model):
     '''Encapsulate the idea of an Article by some author.'''
@@ -15,8 +34,11 @@ class Article(models.Model):
     image_file = models.ImageField(blank=True) # an actual image
     user = models.ForeignKey(User, on_delete=models.CASCADE) ## NEW
 
-
-
+    class Meta:
+        indexes = [
+            # the archive, newest first, paged by (published, id) (see archive.py)
+            models.Index(fields=['published', 'id'], name='article_published_idx'),
+        ]
     
     def __str__(self):
         '''Return a string representation of this Article object.'''
@@ -26,10 +48,29 @@ class Article(models.Model):
         '''Return the URL to display one instance of this model.'''
         return reverse('article', kwargs={'pk':self.pk})
     def get_all_comments(self):
-        '''Return all of the comments about this article.'''
+        '''Return all of the comments about this article, oldest first.
 
-        comments = Comment.objects.filter(article=self)
+        Uses the comments loaded by comments_prefetch() if the article came
+        from a prefetching queryset, instead of querying again.
+        '''
+
+        if 'comment_set' in getattr(self, '_prefetched_objects_cache', {}):
+            return self.comment_set.all()
+        comments = Comment.objects.filter(article=self).order_by('published', 'id')
         return comments
+
+
+def with_comment_counts(articles):
+    '''Annotate articles with comment_count, counted per article only for the rows fetched.'''
+    counts = (Comment.objects.filter(article=models.OuterRef('pk')).order_by()
+              .values('article').annotate(count=Count('id')).values('count'))
+    return articles.annotate(comment_count=Coalesce(models.Subquery(counts), 0))
+
+
+def comments_prefetch():
+    '''Return a Prefetch loading the comments of many articles, oldest first, in one query.'''
+    return models.Prefetch('comment_set', queryset=Comment.objects.order_by('published', 'id'))
+
     
 class Comment(models.Model):
     '''Encapsulate the idea of a Comment on an Article.'''
@@ -40,6 +81,136 @@ class Comment(models.Model):
     text = models.TextField(blank=False)
     published = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # an article's comments in published order
+            models.Index(fields=['article', 'published'], name='comment_article_published_idx'),
+        ]
+    
     def __str__(self):
         '''Return a string representation of this Comment object.'''
-        return f'{self.text}'
\ No newline at end of file
+        return f'{self.text}'
+
+
+class ArticleMonthCount(models.Model):
+    '''The number of articles published in one month, kept up to date by signals.
+
+    The archive pages read these rows instead of counting articles.
+    '''
+
+    year = models.IntegerField()
+    month = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='article_month_unique'),
+        ]
+
+    def __str__(self):
+        '''Return a string representation of this ArticleMonthCount object.'''
+        return f'{self.year}-{self.month:02d}: {self.count} articles'
+
+
+def article_id_range():
+    '''Return (smallest id, largest id, number of articles), cached; (None, None, 0) if there are none.'''
+    id_range = cache.get(ARTICLE_ID_RANGE_CACHE_KEY)
+    if id_range is None:
+        bounds = Article.objects.aggregate(low=Min('id'), high=Max('id'), count=Count('id'))
+        id_range = (bounds['low'], bounds['high'], bounds['count'])
+        cache.set(ARTICLE_ID_RANGE_CACHE_KEY, id_range, ARTICLE_ID_RANGE_TIMEOUT)
+    return id_range
+
+
+def random_probe_count(low, high, count):
+    '''Return how many random ids to draw so that at least one exists with high probability.'''
+    density = count / (high - low + 1)
+    if density >= 1:
+        return 1
+    probes = math.log(RANDOM_MISS_PROBABILITY) / math.log(1 - density)
+    return max(1, min(MAX_RANDOM_PROBES, math.ceil(probes)))
+
+
+def random_article():
+    '''Return a random Article (None if there are none) in one or two indexed queries.
+
+    Draws ids uniformly from the cached id range and fetches them with one
+    primary key lookup; the first drawn id that exists wins, so every
+    article is equally likely however many ids are missing. The number of
+    ids drawn grows with the share of missing ids (see random_probe_count).
+    In the rare case that every id lands in a gap, the nearest article
+    after (or before) the first one is returned instead.
+    '''
+    low, high, count = article_id_range()
+    if low is None:
+        return None
+
+    probes = [random.randint(low, high) for _ in range(random_probe_count(low, high, count))]
+    found = Article.objects.in_bulk(probes)
+    for pk in probes:
+        if pk in found:
+            return found[pk]
+
+    article = (Article.objects.filter(pk__gte=probes[0]).order_by('pk').first()
+               or Article.objects.filter(pk__lte=probes[0]).order_by('-pk').first())
+    if article is None:
+        # the cached range is stale: every article in it was deleted
+        cache.delete(ARTICLE_ID_RANGE_CACHE_KEY)
+    return article
+
+
+@receiver(pre_save, sender=Article)
+def article_saving(sender, instance, **kwargs):
+    '''Remember the month an existing article was published in before saving.
+
+    published is auto_now, so saving an edit can move the article to the
+    current month.
+    '''
+    from .archive import article_month
+
+    if instance._state.adding:
+        instance._previous_month = None
+    elif instance.published is not None:
+        instance._previous_month = article_month(instance.published)
+    else:
+        published = Article.objects.filter(pk=instance.pk).values_list('published', flat=True).first()
+        instance._previous_month = article_month(published) if published else None
+
+
+@receiver(post_save, sender=Article)
+def article_saved(sender, instance, created, **kwargs):
+    '''Update the cached id range, the monthly article counts and the cached article page.'''
+    from .archive import add_to_month_count, article_month
+
+    purge_page_tags_on_commit(f'article:{instance.pk}')
+    if created:
+        cache.delete(ARTICLE_ID_RANGE_CACHE_KEY)
+
+    month = article_month(instance.published)
+    previous = getattr(instance, '_previous_month', None)
+    if previous != month:
+        if previous is not None:
+            add_to_month_count(previous, -1)
+        add_to_month_count(month, 1)
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted(sender, instance, **kwargs):
+    '''Update the cached id range, the monthly article counts and the cached article page.'''
+    from .archive import add_to_month_count, article_month
+
+    purge_page_tags_on_commit(f'article:{instance.pk}')
+    cache.delete(ARTICLE_ID_RANGE_CACHE_KEY)
+    add_to_month_count(article_month(instance.published), -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, **kwargs):
+    '''Purge the cached page of the commented article.'''
+    purge_page_tags_on_commit(f'article:{instance.article_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    '''Purge the cached page of a deleted comment's article.'''
+    purge_page_tags_on_commit(f'article:{instance.article_id}')
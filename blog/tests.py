@@ -1,3 +1,65 @@
 from django.test import TestCase
 
 # Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import Article, Comment, comments_prefetch, with_comment_counts
+
+
+def make_articles(user, articles, comments_each):
+    """Create `articles` articles with `comments_each` comments each; returns the articles."""
+    created = [Article.objects.create(title=f'Article {n}', author='Tester', text='Lorem ipsum', user=user)
+               for n in range(articles)]
+    Comment.objects.bulk_create(
+        Comment(article=article, author='Reader', text=f'Comment {k}')
+        for article in created for k in range(comments_each)
+    )
+    return created
+
+
+def count_queries(function):
+    """Run function() and return how many queries it ran."""
+    with CaptureQueriesContext(connection) as queries:
+        function()
+    return len(queries)
+
+
+@override_settings(ROOT_URLCONF='blog.urls')
+class CommentQueryCountTests(TestCase):
+    """Article pages run the same number of queries however many articles and comments there are."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester')
+
+    def test_comment_counts_use_one_query(self):
+        make_articles(self.user, 50, 100)
+        with self.assertNumQueries(1):
+            counts = [article.comment_count for article in with_comment_counts(Article.objects.all())]
+        self.assertEqual(counts, [100] * 50)
+
+    def test_prefetched_comments_use_one_extra_query(self):
+        make_articles(self.user, 50, 100)
+        with self.assertNumQueries(2):
+            for article in Article.objects.prefetch_related(comments_prefetch()):
+                self.assertEqual(len(article.get_all_comments()), 100)
+
+    def test_article_list_queries_do_not_grow_with_articles_or_comments(self):
+        make_articles(self.user, 5, 2)
+        expected = count_queries(lambda: self.client.get('/show_all'))
+
+        make_articles(self.user, 50, 100)
+        with self.assertNumQueries(expected):
+            response = self.client.get('/show_all')
+        self.assertEqual(response.status_code, 200)
+
+    def test_article_page_queries_do_not_grow_with_comments(self):
+        few, = make_articles(self.user, 1, 1)
+        many, = make_articles(self.user, 1, 100)
+
+        expected = count_queries(lambda: self.client.get(f'/article/{few.pk}'))
+        with self.assertNumQueries(expected):
+            response = self.client.get(f'/article/{many.pk}')
+        self.assertEqual(len(response.context['article'].get_all_comments()), 100)
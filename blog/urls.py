@@ -7,6 +7,9 @@ urlpatterns = [
     path('', RandomArticleView.as_view(), name="random"),
     path('show_all', ShowAllView.as_view(), name="show_all"), # modified
     path('article/<int:pk>', ArticleView.as_view(), name='article'),# new
+    path('archive/', ArchiveView.as_view(), name='archive'),
+    path('archive/<int:year>/', YearArchiveView.as_view(), name='archive_year'),
+    path('archive/<int:year>/<int:month>/', MonthArchiveView.as_view(), name='archive_month'),
     path('article/create', CreateArticleView.as_view(), name="create_article"), # new
     # path('create_comment', CreateCommentView.as_view(), name='create_comment'), ### FIRST (WITHOUT PK)
     path('article/<int:pk>/create_comment', CreateCommentView.as_view(), name='create_comment'), ### NEW
@@ -5,13 +5,15 @@
 #from django.shortcuts import render
 
 
-from .models import Article, Comment
-from django.views.generic import ListView, DetailView, CreateView, UpdateView
+from .models import Article, Comment, comments_prefetch, random_article, with_comment_counts
+from .archive import archive_months, archive_page, archive_years, month_bounds
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, TemplateView
 from .forms import CreateArticleForm, UpdateArticleForm
-import random
 from django.views.generic.edit import CreateView, DeleteView
 from .forms import CreateCommentForm
 from django.urls import reverse
+from django.http import Http404
+from cs412.page_cache import cache_anonymous_page
 
 
 from django.contrib.auth.mixins import LoginRequiredMixin ## NEW
@@ -24,11 +26,28 @@ from django.contrib.auth import login # NEW
 
 
 class ShowAllView(ListView):
-    '''Create a subclass of ListView to display all blog articles.'''
+    '''Create a subclass of ListView to display the blog articles, newest first.
+
+    Shows one page at a time; ?before= is the cursor of the last article
+    on the previous page.
+    '''
 
     model = Article # retrieve objects of type Article from the database
     template_name = 'blog/show_all.html'
     context_object_name = 'articles' # how to find the data in the template file
+
+    def get_queryset(self):
+        '''Return one page of articles, each with its number of comments.'''
+        page, self.next_cursor = archive_page(
+            with_comment_counts(Article.objects.all()), cursor=self.request.GET.get('before'))
+        return page
+
+    def get_context_data(self, **kwargs):
+        '''Add the cursor of the next page.'''
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
+
     def dispatch(self, request, *args, **kwargs):
         '''Override the dispatch method to add debugging information.'''
 
@@ -40,11 +59,80 @@ class ShowAllView(ListView):
         return super().dispatch(request, *args, **kwargs)
     
     
+class ArchiveView(TemplateView):
+    '''List the years and months that have articles, with their article counts.'''
+
+    template_name = 'blog/archive.html'
+
+    def get_context_data(self, **kwargs):
+        '''Add the years and months, read from the precomputed monthly counts.'''
+        context = super().get_context_data(**kwargs)
+        months = archive_months()
+        context['years'] = archive_years(months)
+        context['months'] = months
+        return context
+
+
+class YearArchiveView(ListView):
+    '''Show the articles of one year, newest first, one page at a time.'''
+
+    template_name = 'blog/archive_period.html'
+    context_object_name = 'articles'
+
+    def get_period(self):
+        '''Return the [start, end) datetimes of the year; 404 for a year datetimes can't hold.'''
+        year = self.kwargs['year']
+        if not 1 <= year < 9999:
+            raise Http404('No such year')
+        return month_bounds(year, 1)[0], month_bounds(year, 12)[1]
+
+    def get_queryset(self):
+        '''Return one page of the period's articles, each with its number of comments.'''
+        start, end = self.get_period()
+        page, self.next_cursor = archive_page(
+            with_comment_counts(Article.objects.all()), start=start, end=end,
+            cursor=self.request.GET.get('before'))
+        return page
+
+    def get_context_data(self, **kwargs):
+        '''Add the period, its monthly counts and the cursor of the next page.'''
+        context = super().get_context_data(**kwargs)
+        year = self.kwargs['year']
+        months = archive_months(year)
+        context['year'] = year
+        context['months'] = months
+        context['total'] = sum(month.count for month in months)
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+class MonthArchiveView(YearArchiveView):
+    '''Show the articles of one month, newest first, one page at a time.'''
+
+    def get_period(self):
+        '''Return the [start, end) datetimes of the month; 404 for an invalid month.'''
+        if not 1 <= self.kwargs['year'] < 9999 or not 1 <= self.kwargs['month'] <= 12:
+            raise Http404('No such month')
+        return month_bounds(self.kwargs['year'], self.kwargs['month'])
+
+    def get_context_data(self, **kwargs):
+        '''Narrow the counts to the month shown.'''
+        context = super().get_context_data(**kwargs)
+        context['month'] = month_bounds(self.kwargs['year'], self.kwargs['month'])[0]
+        context['total'] = sum(m.count for m in context['months'] if m.month == self.kwargs['month'])
+        return context
+
+
+@cache_anonymous_page('article:{pk}')
 class ArticleView(DetailView):
-    '''Show the details for one article.'''
+    '''Show the details for one article; cached for anonymous visitors until it or its comments change.'''
     model = Article
     template_name = 'blog/article.html' ## reusing same template!!
     context_object_name = 'article'
+
+    def get_queryset(self):
+        '''Load the article together with all of its comments (one extra query).'''
+        return Article.objects.prefetch_related(comments_prefetch())
     
 class RandomArticleView(DetailView):
     '''Show the details for one article.'''
@@ -54,10 +142,12 @@ class RandomArticleView(DetailView):
 
     # pick one article at random:
     def get_object(self):
-        '''Return one Article object chosen at random.'''
+        '''Return one Article object chosen at random, without loading every article.'''
 
-        all_articles = Article.objects.all()
-        return random.choice(all_articles)
+        article = random_article()
+        if article is None:
+            raise Http404('No articles yet')
+        return article
     
 class CreateArticleView(LoginRequiredMixin, CreateView):
     '''A view to handle creation of a new Article.
@@ -0,0 +1,188 @@
+# File: page_cache.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Whole-page cache for anonymous visitors.
+# Views opt in with @cache_anonymous_page(tags...). PageCacheMiddleware serves
+# their rendered responses from the cache selected by PAGE_CACHE_ALIAS, keyed
+# by host, path and normalized query string plus the current version of every
+# tag. Model signals call purge_page_tags() to bump a tag's version, which
+# retires every cached page carrying that tag at once.
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import transaction
+from django.utils.http import urlencode
+
+# seconds a cached page is served before it is rendered again, even if
+# none of its tags changed
+DEFAULT_PAGE_CACHE_TIMEOUT = 5 * 60
+
+# prefixes of the cache keys used by the page cache
+PAGE_KEY_PREFIX = 'page_cache:page:'
+TAG_KEY_PREFIX = 'page_cache:tag:'
+
+# cache keys of the hit / miss counters
+HITS_KEY = 'page_cache:hits'
+MISSES_KEY = 'page_cache:misses'
+
+# response header telling whether a page came from the cache
+STATUS_HEADER = 'X-Page-Cache'
+
+
+def page_cache():
+    """Return the cache backend pages are stored in (settings.PAGE_CACHE_ALIAS)."""
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)]
+
+
+def cache_anonymous_page(*tags):
+    """Mark a view (function or class) as cacheable for anonymous visitors.
+
+    Each tag names something the page shows; it may contain URL keyword
+    arguments in braces, e.g. 'restroom:{pk}'. Purging a tag with
+    purge_page_tags() retires every cached page carrying it.
+    """
+    def decorator(view):
+        view.page_cache_tags = tags
+        return view
+    return decorator
+
+
+def view_page_tags(view_func, view_kwargs):
+    """Return the tags of a resolved view with URL arguments filled in, or None if it is not cacheable."""
+    tags = getattr(view_func, 'page_cache_tags', None)
+    if tags is None:
+        # class-based views carry the tags on the class, not on as_view()'s function
+        tags = getattr(getattr(view_func, 'view_class', None), 'page_cache_tags', None)
+    if tags is None:
+        return None
+    return [tag.format(**view_kwargs) for tag in tags]
+
+
+def tag_versions(cache, tags):
+    """Return the current version of each tag, giving unseen tags a fresh one."""
+    keys = [TAG_KEY_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # start from the clock rather than 1, so a tag whose version was
+        # evicted never comes back to a version old pages were stored under
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def purge_page_tags(*tags):
+    """Retire every cached page carrying any of the tags."""
+    cache = page_cache()
+    for tag in tags:
+        key = TAG_KEY_PREFIX + tag
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def purge_page_tags_on_commit(*tags):
+    """Purge the tags once the current transaction commits (right away outside one).
+
+    Purging only after the commit keeps a request that is still reading the
+    old rows from caching them under the new tag versions.
+    """
+    transaction.on_commit(lambda: purge_page_tags(*tags))
+
+
+def page_key(request, versions):
+    """Return the cache key of a page: host, path, sorted query string and tag versions."""
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    raw = f'{request.get_host()}{request.path}?{query}|{",".join(map(str, versions))}'
+    return PAGE_KEY_PREFIX + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def count(cache, key):
+    """Add one to a hit / miss counter."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def page_cache_stats():
+    """Return the hit / miss counters of the page cache.
+
+    Returns:
+        dict: {'hits': int, 'misses': int, 'hit_rate': float between 0 and 1}
+    """
+    counters = page_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+
+def reset_page_cache_stats():
+    """Set the hit / miss counters back to zero."""
+    page_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+def is_cacheable_request(request):
+    """Return True for GET requests from anonymous visitors with no pending flash messages."""
+    if request.method != 'GET':
+        return False
+    user = getattr(request, 'user', None)
+    if user is None or user.is_authenticated:
+        return False
+    # a message waiting for this visitor has to be rendered into the page
+    storage = getattr(request, '_messages', None)
+    return not (storage is not None and len(storage))
+
+
+def is_storable_response(request, response):
+    """Return True if a response is the same for every anonymous visitor and may be cached."""
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if 'private' in response.get('Cache-Control', '') or 'no-store' in response.get('Cache-Control', ''):
+        return False
+    # the page holds a CSRF token, which belongs to this visitor only
+    return not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+
+
+class PageCacheMiddleware:
+    """Serve pages marked with @cache_anonymous_page from the page cache.
+
+    Must come after AuthenticationMiddleware and MessageMiddleware, which it
+    reads to decide whether a request may be served from the cache.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, '_page_cache_key', None)
+        if key is not None:
+            if is_storable_response(request, response):
+                timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', DEFAULT_PAGE_CACHE_TIMEOUT)
+                page_cache().set(key, response, timeout)
+            response[STATUS_HEADER] = 'MISS'
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Return the cached page for this request, or None to render it."""
+        tags = view_page_tags(view_func, view_kwargs)
+        if tags is None or not is_cacheable_request(request):
+            return None
+
+        cache = page_cache()
+        key = page_key(request, tag_versions(cache, tags))
+        response = cache.get(key)
+        if response is None:
+            count(cache, MISSES_KEY)
+            request._page_cache_key = key
+            return None
+        count(cache, HITS_KEY)
+        response[STATUS_HEADER] = 'HIT'
+        return response
@@ -80,6 +80,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'cs412.page_cache.PageCacheMiddleware', # whole-page cache for anonymous visitors
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -97,6 +98,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'mini_fb.context_processors.current_profile',  # no-op while mini_fb is disabled
             ],
         },
     },
@@ -107,14 +109,100 @@ WSGI_APPLICATION = 'cs412.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# DATABASE_ENGINE picks the database: 'sqlite' (the default) or
+# 'postgresql'. DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD,
+# DATABASE_HOST and DATABASE_PORT fill in the connection.
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'cs412'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            # make sure a reused connection is still alive before a request uses it
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DATABASE_POOL_SIZE'):
+        # share a psycopg connection pool (needs psycopg[pool]) between the
+        # threads of a worker; Django requires CONN_MAX_AGE = 0 with a pool
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': 2,
+                'max_size': int(os.environ['DATABASE_POOL_SIZE']),
+                'timeout': 10,
+            },
+        }
+    else:
+        # keep each thread's connection open between requests (seconds)
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DATABASE_CONN_MAX_AGE', 600))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # seconds to wait for another connection's write lock
+                # (busy_timeout) before failing with "database is locked"
+                'timeout': 20,
+                # take the write lock when a transaction begins, so a
+                # transaction that reads before writing waits in the busy
+                # timeout instead of failing when it upgrades its lock
+                'transaction_mode': 'IMMEDIATE',
+                # run on every new connection: write-ahead logging lets reads
+                # go on during a write, synchronous=NORMAL syncs only at WAL
+                # checkpoints, and reads use up to 128 MB of memory-mapped I/O
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+            },
+        }
+    }
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# Whole pages for anonymous visitors are stored in the 'pages' cache (see
+# cs412/page_cache.py). PAGE_CACHE_BACKEND picks where: 'locmem' (per
+# process, the default), 'file' (shared by the processes of one host) or
+# 'redis' (shared by every host; PAGE_CACHE_LOCATION is the server URL).
+
+PAGE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('PAGE_CACHE_LOCATION', os.path.join(BASE_DIR, 'page_cache')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('PAGE_CACHE_LOCATION', 'redis://127.0.0.1:6379'),
+    },
+}
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pages': PAGE_CACHE_BACKENDS[os.environ.get('PAGE_CACHE_BACKEND', 'locmem')],
 }
 
+PAGE_CACHE_ALIAS = 'pages'
+PAGE_CACHE_TIMEOUT = 5 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
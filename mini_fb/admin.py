@@ -6,7 +6,7 @@
 from django.contrib import admin
 
 # import our custom models to register them with the admin interface
-from .models import Profile, StatusMessage, Image, StatusImage, Friend
+from .models import Profile, StatusMessage, Image, StatusImage, Friend, TimelineEntry
 
 # register the Profile model with Django admin
 # this allows CRUD operations on Profile objects through the admin interface
@@ -19,4 +19,6 @@ admin.site.register(StatusMessage)
 admin.site.register(Image)
 admin.site.register(StatusImage)
 
-admin.site.register(Friend)
\ No newline at end of file
+admin.site.register(Friend)
+
+admin.site.register(TimelineEntry)
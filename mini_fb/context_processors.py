@@ -0,0 +1,23 @@
+# File: context_processors.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Template context processors for the mini_fb application.
+
+from functools import partial
+
+from django.apps import apps
+
+
+def current_profile(request):
+    """Give every template `current_profile`, the logged-in user's Profile.
+
+    The value is a callable, so the profile is only looked up if a template
+    uses it, and then at most once per request. This covers views without
+    CurrentProfileMixin, such as the login and registration pages. Nothing
+    is added while mini_fb is not an installed app.
+    """
+    if not apps.is_installed('mini_fb'):
+        return {}
+    # imported here so this module can be listed in settings while mini_fb is disabled
+    from .current_profile import get_current_profile
+
+    return {'current_profile': partial(get_current_profile, request)}
@@ -0,0 +1,59 @@
+# File: current_profile.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Resolves the logged-in user's Profile for mini_fb views.
+# The profile is looked up at most once per request, and its id is kept in
+# the session so later requests fetch it by primary key.
+
+from .models import Profile
+
+# session key holding the logged-in user's profile id
+SESSION_KEY = 'mini_fb_profile_id'
+
+
+def get_current_profile(request):
+    """Return the logged-in user's Profile, or None, resolving it once per request."""
+    if not hasattr(request, '_mini_fb_profile'):
+        request._mini_fb_profile = load_current_profile(request)
+    return request._mini_fb_profile
+
+
+def load_current_profile(request):
+    """Look up the logged-in user's Profile, using the profile id cached in the session if any."""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+
+    session = getattr(request, 'session', None)
+    if session is not None and SESSION_KEY in session:
+        # the user check keeps a stale id from resolving to another user's profile
+        profile = Profile.objects.filter(pk=session[SESSION_KEY], user=user).first()
+        if profile is not None:
+            return profile
+
+    profile = Profile.objects.filter(user=user).first()
+    if session is not None:
+        if profile is not None:
+            session[SESSION_KEY] = profile.pk
+        else:
+            session.pop(SESSION_KEY, None)
+    return profile
+
+
+class CurrentProfileMixin:
+    """View mixin giving access to the logged-in user's Profile.
+
+    Templates get `current_profile`, which is only looked up if the
+    template uses it. mini_fb.context_processors.current_profile provides
+    the same variable to views without this mixin.
+    """
+
+    def get_current_profile(self):
+        """Return the logged-in user's Profile, or None."""
+        return get_current_profile(self.request)
+
+    def get_context_data(self, **kwargs):
+        """Add the (lazily resolved) current profile to the context."""
+        context = super().get_context_data(**kwargs)
+        # templates call this on first use; the result is memoized on the request
+        context['current_profile'] = self.get_current_profile
+        return context
@@ -0,0 +1,82 @@
+# File: directory.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: The paginated profile directory for the mini_fb application.
+# Profiles are listed in case-insensitive (last name, first name, id) order
+# and paged with a cursor on that key, so every page is an index range scan
+# however deep the reader goes.
+
+import base64
+import binascii
+import json
+
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Lower
+
+from .models import Profile
+
+# number of profiles shown per directory page
+DIRECTORY_PAGE_SIZE = 24
+
+
+def encode_cursor(profile):
+    """Encode a profile's directory position as an opaque URL-safe string."""
+    raw = json.dumps([profile.last_key, profile.first_key, profile.pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor(); returns (last, first, id) or None if malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last, first, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return str(last), str(first), int(pk)
+    except (binascii.Error, ValueError, TypeError, UnicodeError):
+        return None
+
+
+def prefix_range(field, prefix):
+    """Q matching values of `field` that start with `prefix`, as an index-friendly range."""
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': Concat(prefix, Value('\U0010ffff'))})
+
+
+def directory_queryset(city=None, name=None):
+    """Return profiles in directory order, optionally filtered.
+
+    Args:
+        city (str): Only profiles in this city (case-insensitive)
+        name (str): Only profiles whose first or last name starts with this (case-insensitive)
+    """
+    # the keys are selected, so the last profile on a page can be encoded as a cursor
+    profiles = Profile.objects.annotate(last_key=Lower('last_name'), first_key=Lower('first_name'))
+    # filter values are lowercased by the database too, so they match the
+    # indexed keys exactly (SQLite's lower() only folds ASCII letters)
+    if city:
+        profiles = profiles.alias(city_key=Lower('city')).filter(city_key=Lower(Value(city.strip())))
+    if name:
+        prefix = Lower(Value(name.strip()))
+        profiles = profiles.filter(prefix_range('last_key', prefix) | prefix_range('first_key', prefix))
+    return profiles.order_by('last_key', 'first_key', 'id')
+
+
+def get_directory_page(city=None, name=None, cursor=None, limit=DIRECTORY_PAGE_SIZE):
+    """Return one page of the profile directory.
+
+    Returns:
+        tuple: (list of Profile, next_cursor or None if this is the last page)
+    """
+    profiles = directory_queryset(city, name)
+    position = decode_cursor(cursor)
+    if position is not None:
+        last, first, pk = position
+        # the redundant last_key bound lets the database seek into the index
+        profiles = profiles.filter(last_key__gte=last).filter(
+            Q(last_key__gt=last)
+            | Q(last_key=last, first_key__gt=first)
+            | Q(last_key=last, first_key=first, id__gt=pk)
+        )
+
+    page = list(profiles[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
@@ -0,0 +1,320 @@
+# File: graph.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: In-memory social graph for the mini_fb application.
+# Friendships are loaded from the Friend table into compressed sparse row
+# (CSR) arrays, with small overlays for edges added or removed since, so
+# mutual friends, friend-of-friend counts and degrees of separation are
+# answered without SQL. Every process keeps its own copy and reloads it when
+# the SocialGraphVersion row shows another process changed a friendship.
+
+import threading
+import time
+from itertools import chain
+
+from .models import Friend, SocialGraphVersion
+
+# rows fetched per round trip when loading the Friend table
+LOAD_CHUNK_SIZE = 10000
+
+# overlay edges kept before they are merged into the CSR arrays
+COMPACT_AFTER = 10000
+
+# seconds before a process reloads the graph regardless of its version
+GRAPH_MAX_AGE = 10 * 60
+
+# seconds between checks of SocialGraphVersion; friendships changed by other
+# processes show up in this process's graph at most this long after commit
+GRAPH_VERSION_CHECK_INTERVAL = 5
+
+# longest friend path searched for by shortest_path()
+MAX_SEPARATION = 6
+
+
+class SocialGraph:
+    """Undirected friendship graph in CSR form with incremental overlays.
+
+    `nodes` holds the sorted ids of profiles with at least one friend; the
+    friends of nodes[k] are indices[indptr[k]:indptr[k + 1]], sorted.
+    Edges added or removed after the arrays were built live in the
+    `added` / `removed` overlays (profile id -> frozenset of friend ids).
+    Overlay sets are replaced rather than mutated, so readers never need
+    a lock.
+    """
+
+    def __init__(self, nodes, indptr, indices):
+        self.nodes = nodes
+        self.indptr = indptr
+        self.indices = indices
+        self.added = {}
+        self.removed = {}
+        self.pending_changes = 0
+        self.built_at = time.monotonic()
+        # SocialGraphVersion.version the graph reflects, and when it was last compared
+        self.version = 0
+        self.checked_at = self.built_at
+
+    @classmethod
+    def from_database(cls):
+        """Build the graph from every Friend row."""
+        import numpy as np
+
+        # read before the edges: a change committed while they load makes
+        # the next version check reload again rather than go unnoticed
+        version = read_graph_version()
+        rows = Friend.objects.values_list('profile1_id', 'profile2_id').iterator(chunk_size=LOAD_CHUNK_SIZE)
+        edges = np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+        graph = cls.from_edges(edges)
+        graph.version = version
+        return graph
+
+    @classmethod
+    def from_edges(cls, edges):
+        """Build the graph from an (n, 2) array of friendships, each listed once."""
+        import numpy as np
+
+        # store every edge in both directions, grouped by source
+        sources = np.concatenate([edges[:, 0], edges[:, 1]])
+        targets = np.concatenate([edges[:, 1], edges[:, 0]])
+        order = np.lexsort((targets, sources))
+        sources, targets = sources[order], targets[order]
+
+        nodes, degrees = np.unique(sources, return_counts=True)
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        return cls(nodes, indptr, targets)
+
+    @property
+    def nbytes(self):
+        """Memory held by the CSR arrays, in bytes."""
+        return self.nodes.nbytes + self.indptr.nbytes + self.indices.nbytes
+
+    def base_friends(self, profile_id):
+        """Return the friends of a profile as stored in the CSR arrays (ignoring overlays)."""
+        k = self.nodes.searchsorted(profile_id)
+        if k < len(self.nodes) and self.nodes[k] == profile_id:
+            return self.indices[self.indptr[k]:self.indptr[k + 1]]
+        return self.indices[:0]
+
+    def friend_array(self, profile_id):
+        """Return the sorted ids of a profile's friends as a numpy array."""
+        import numpy as np
+
+        friends = self.base_friends(profile_id)
+        removed = self.removed.get(profile_id)
+        added = self.added.get(profile_id)
+        if removed:
+            friends = np.setdiff1d(friends, np.fromiter(removed, dtype=np.int64), assume_unique=True)
+        if added:
+            friends = np.union1d(friends, np.fromiter(added, dtype=np.int64))
+        return friends
+
+    def friends(self, profile_id):
+        """Return the sorted ids of a profile's friends."""
+        return self.friend_array(profile_id).tolist()
+
+    def are_friends(self, a, b):
+        """Return True if profiles a and b are friends."""
+        if b in self.added.get(a, ()):
+            return True
+        if b in self.removed.get(a, ()):
+            return False
+        base = self.base_friends(a)
+        k = base.searchsorted(b)
+        return bool(k < len(base) and base[k] == b)
+
+    def mutual_friends(self, a, b):
+        """Return the sorted ids of profiles that are friends of both a and b."""
+        import numpy as np
+
+        return np.intersect1d(self.friend_array(a), self.friend_array(b), assume_unique=True).tolist()
+
+    def friends_of_friends_count(self, profile_id):
+        """Return how many profiles are exactly two hops away (friends of friends, not friends)."""
+        import numpy as np
+
+        friends = self.friend_array(profile_id)
+        if not len(friends):
+            return 0
+        reachable = np.unique(np.concatenate([self.friend_array(friend) for friend in friends.tolist()]))
+        # every friend's list contains the profile itself, so exclude it along with the friends
+        return len(np.setdiff1d(reachable, np.append(friends, profile_id)))
+
+    def shortest_path(self, source, target, max_depth=MAX_SEPARATION):
+        """Return a shortest friend path from source to target as a list of profile ids.
+
+        Runs a bidirectional breadth-first search, always expanding the
+        smaller frontier, so only about the square root of the nodes a
+        one-sided search would touch are visited. Returns None if the
+        profiles are not connected within max_depth hops; the degrees of
+        separation are len(path) - 1.
+        """
+        if source == target:
+            return [source]
+
+        parents_forward = {source: None}
+        parents_backward = {target: None}
+        frontier_forward = [source]
+        frontier_backward = [target]
+
+        for _ in range(max_depth):
+            if not frontier_forward or not frontier_backward:
+                return None
+            if len(frontier_forward) <= len(frontier_backward):
+                frontier_forward, meeting = self.expand(frontier_forward, parents_forward, parents_backward)
+            else:
+                frontier_backward, meeting = self.expand(frontier_backward, parents_backward, parents_forward)
+            if meeting is not None:
+                return self.join_paths(meeting, parents_forward, parents_backward)
+        return None
+
+    def expand(self, frontier, parents, other_parents):
+        """Advance one BFS level; returns (next frontier, node where the searches met or None)."""
+        next_frontier = []
+        for node in frontier:
+            for friend in self.friends(node):
+                if friend in parents:
+                    continue
+                parents[friend] = node
+                if friend in other_parents:
+                    return next_frontier, friend
+                next_frontier.append(friend)
+        return next_frontier, None
+
+    @staticmethod
+    def join_paths(meeting, parents_forward, parents_backward):
+        """Join the two half paths that meet at `meeting` into source -> target order."""
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = parents_forward[node]
+        path.reverse()
+        node = parents_backward[meeting]
+        while node is not None:
+            path.append(node)
+            node = parents_backward[node]
+        return path
+
+    def add_edge(self, a, b):
+        """Record a new friendship between a and b (no-op if they are already friends)."""
+        if a == b or self.are_friends(a, b):
+            return
+        for node, other in ((a, b), (b, a)):
+            if other in self.removed.get(node, ()):
+                self.removed[node] = self.removed[node] - {other}
+            else:
+                self.added[node] = self.added.get(node, frozenset()) | {other}
+        self.pending_changes += 1
+
+    def remove_edge(self, a, b):
+        """Record that a and b are no longer friends (no-op if they were not)."""
+        if not self.are_friends(a, b):
+            return
+        for node, other in ((a, b), (b, a)):
+            if other in self.added.get(node, ()):
+                self.added[node] = self.added[node] - {other}
+            else:
+                self.removed[node] = self.removed.get(node, frozenset()) | {other}
+        self.pending_changes += 1
+
+    def compacted(self):
+        """Return a new graph with the overlays merged into the CSR arrays."""
+        import numpy as np
+
+        sources = np.repeat(self.nodes, np.diff(self.indptr))
+        targets = self.indices
+        # each edge once, as (smaller id, larger id)
+        keep = sources < targets
+        edges = np.column_stack([sources[keep], targets[keep]])
+
+        removed = [(a, b) for a, friends in self.removed.items() for b in friends if a < b]
+        if removed:
+            removed = np.array(removed, dtype=np.int64)
+            # compare pairs as single values so np.isin can match them
+            width = int(max(edges.max(initial=0), removed.max())) + 1
+            keep = ~np.isin(edges[:, 0] * width + edges[:, 1], removed[:, 0] * width + removed[:, 1])
+            edges = edges[keep]
+
+        added = [(a, b) for a, friends in self.added.items() for b in friends if a < b]
+        if added:
+            edges = np.concatenate([edges, np.array(added, dtype=np.int64)])
+
+        graph = SocialGraph.from_edges(edges)
+        graph.built_at = self.built_at
+        graph.version = self.version
+        graph.checked_at = self.checked_at
+        return graph
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def read_graph_version():
+    """Return the current SocialGraphVersion from the database (0 before any change)."""
+    return SocialGraphVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def is_stale(graph):
+    """Return True if the graph must be reloaded: it is GRAPH_MAX_AGE old or behind the database.
+
+    The database version is read at most every GRAPH_VERSION_CHECK_INTERVAL
+    seconds, so a loaded graph costs one small query per interval.
+    """
+    now = time.monotonic()
+    if now - graph.built_at > GRAPH_MAX_AGE:
+        return True
+    if now - graph.checked_at <= GRAPH_VERSION_CHECK_INTERVAL:
+        return False
+    graph.checked_at = now
+    return read_graph_version() != graph.version
+
+
+def get_social_graph():
+    """Return this process's SocialGraph, loading it on first use or when it is stale (see is_stale)."""
+    global _graph
+    graph = _graph
+    if graph is None or is_stale(graph):
+        with _graph_lock:
+            # unless another thread reloaded it meanwhile (compacting keeps built_at)
+            if _graph is None or (graph is not None and _graph.built_at == graph.built_at):
+                _graph = SocialGraph.from_database()
+            graph = _graph
+    return graph
+
+
+def reset_social_graph():
+    """Drop the loaded graph; the next get_social_graph() reloads it from the database."""
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+def friendship_added(a, b, version):
+    """Apply a committed new friendship, which set SocialGraphVersion to `version`, to the loaded graph."""
+    update_social_graph(SocialGraph.add_edge, a, b, version)
+
+
+def friendship_removed(a, b, version):
+    """Apply a committed removed friendship, which set SocialGraphVersion to `version`, to the loaded graph."""
+    update_social_graph(SocialGraph.remove_edge, a, b, version)
+
+
+def update_social_graph(change, a, b, version):
+    """Apply an edge change to the loaded graph, compacting it once the overlays grow large.
+
+    If the change directly follows the graph's version, the graph takes on
+    the new version. Otherwise another process changed a friendship in
+    between, and the graph keeps its older version so the next check
+    reloads it.
+    """
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            # nothing loaded yet; the first load will read the change from the database
+            return
+        change(_graph, a, b)
+        if _graph.version == version - 1:
+            _graph.version = version
+        if _graph.pending_changes >= COMPACT_AFTER:
+            _graph = _graph.compacted()
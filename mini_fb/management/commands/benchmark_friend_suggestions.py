@@ -0,0 +1,83 @@
+# File: benchmark_friend_suggestions.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Measures friend suggestion latency on a synthetic social graph.
+
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mini_fb.models import Friend, Profile, friend_suggestions_cache_key
+
+
+class Command(BaseCommand):
+    """Time Profile.get_friend_suggestions() on a random graph.
+    
+    Synthetic profiles and friendships are inserted inside a transaction
+    that is rolled back at the end, so existing data is left untouched.
+    
+    Usage: python manage.py benchmark_friend_suggestions --profiles 100000 --edges 1000000
+    """
+    help = 'Benchmark mutual-friend ranked friend suggestions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=100_000)
+        parser.add_argument('--edges', type=int, default=1_000_000)
+        parser.add_argument('--samples', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Inserting {options['profiles']} profiles and {options['edges']} friendships...")
+            profile_ids = self.seed(options['profiles'], options['edges'])
+
+            rng = random.Random(412)
+            sample = rng.sample(profile_ids, min(options['samples'], len(profile_ids)))
+
+            cold, warm = [], []
+            for pk in sample:
+                cache.delete(friend_suggestions_cache_key(pk))
+
+                profile = Profile.objects.get(pk=pk)
+                start = time.perf_counter()
+                profile.get_friend_suggestions()
+                cold.append((time.perf_counter() - start) * 1000)
+
+                # a new request: fresh Profile object, cached ranking
+                profile = Profile.objects.get(pk=pk)
+                start = time.perf_counter()
+                profile.get_friend_suggestions()
+                warm.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(f'uncached: median {statistics.median(cold):8.2f} ms, max {max(cold):8.2f} ms')
+            self.stdout.write(f'  cached: median {statistics.median(warm):8.2f} ms, max {max(warm):8.2f} ms')
+
+            for pk in sample:
+                cache.delete(friend_suggestions_cache_key(pk))
+            transaction.set_rollback(True)
+
+    def seed(self, profiles, edges, batch_size=10000):
+        """Insert profiles and random friendships; return the new profile ids."""
+        user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+        Profile.objects.bulk_create(
+            (Profile(first_name=f'First{i}', last_name=f'Last{i}', city='Boston',
+                     email_address=f'user{i}@example.com', user=user)
+             for i in range(profiles)),
+            batch_size=batch_size,
+        )
+        profile_ids = list(Profile.objects.filter(user=user).values_list('pk', flat=True))
+
+        rng = random.Random(412)
+        batch = []
+        for _ in range(edges):
+            low, high = sorted(rng.sample(profile_ids, 2))
+            batch.append(Friend(profile1_id=low, profile2_id=high))
+            if len(batch) >= batch_size:
+                Friend.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            Friend.objects.bulk_create(batch, ignore_conflicts=True)
+        return profile_ids
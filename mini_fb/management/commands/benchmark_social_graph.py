@@ -0,0 +1,59 @@
+# File: benchmark_social_graph.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Measures social graph load time and query latency on a synthetic social graph.
+
+import random
+import statistics
+import time
+
+from django.db import transaction
+
+from mini_fb.graph import SocialGraph
+from mini_fb.management.commands.benchmark_friend_suggestions import Command as SuggestionBenchmark
+
+
+class Command(SuggestionBenchmark):
+    """Time SocialGraph loading, mutual friends, friend-of-friend counts and shortest paths.
+    
+    Uses the same synthetic, rolled-back data as benchmark_friend_suggestions.
+    
+    Usage: python manage.py benchmark_social_graph --profiles 100000 --edges 1000000
+    """
+    help = 'Benchmark the in-memory social graph (mutual friends, degrees of separation)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Inserting {options['profiles']} profiles and {options['edges']} friendships...")
+            profile_ids = self.seed(options['profiles'], options['edges'])
+
+            start = time.perf_counter()
+            graph = SocialGraph.from_database()
+            load = time.perf_counter() - start
+            self.stdout.write(f'load: {load:.2f} s, {len(graph.indices) // 2} edges, '
+                              f'{graph.nbytes / 2 ** 20:.1f} MiB of arrays')
+
+            # a different seed from seed(), so the pairs are not the inserted friendships
+            rng = random.Random(2025)
+            pairs = [rng.sample(profile_ids, 2) for _ in range(options['samples'])]
+            self.report('mutual friends', [lambda a=a, b=b: graph.mutual_friends(a, b) for a, b in pairs])
+            self.report('friends of friends', [lambda a=a: graph.friends_of_friends_count(a) for a, _ in pairs])
+            self.report('shortest path', [lambda a=a, b=b: graph.shortest_path(a, b) for a, b in pairs])
+            self.report('add + remove edge', [lambda a=a, b=b: (graph.add_edge(a, b), graph.remove_edge(a, b))
+                                              for a, b in pairs])
+
+            start = time.perf_counter()
+            for a, b in pairs:
+                graph.add_edge(a, b)
+            graph.compacted()
+            self.stdout.write(f'compaction: {(time.perf_counter() - start) * 1000:.0f} ms')
+
+            transaction.set_rollback(True)
+
+    def report(self, label, calls):
+        """Run each call once and print the median and maximum latency."""
+        timings = []
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(f'{label:>20}: median {statistics.median(timings):8.3f} ms, max {max(timings):8.3f} ms')
@@ -0,0 +1,26 @@
+# File: rebuild_status_search.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Rebuilds the full-text search index of status messages.
+
+from django.core.management.base import BaseCommand
+
+from mini_fb.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """Refill the status message search index from the StatusMessage table.
+    
+    The index is created and filled automatically on first use and kept up
+    to date as statuses change; this is only needed after writing statuses
+    without signals (e.g. bulk_create or raw SQL).
+    
+    Usage: python manage.py rebuild_status_search
+    """
+    help = 'Rebuild the status message search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index(options['database'])
+        self.stdout.write(f'Indexed {count} status messages')
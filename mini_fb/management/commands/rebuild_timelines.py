@@ -0,0 +1,32 @@
+# File: rebuild_timelines.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Rebuilds the materialized news feed timelines from statuses and friendships.
+
+from django.core.management.base import BaseCommand
+
+from mini_fb.models import Profile
+from mini_fb.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    """Recreate the TimelineEntry rows of every profile (or the given profiles).
+    
+    Needed once for statuses posted before timelines existed; afterwards the
+    timelines are kept up to date as statuses and friendships change.
+    
+    Usage: python manage.py rebuild_timelines [profile_id ...]
+    """
+    help = 'Rebuild news feed timelines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.order_by('pk').values_list('pk', flat=True)
+        if options['profile_ids']:
+            profiles = profiles.filter(pk__in=options['profile_ids'])
+
+        total = 0
+        for profile_id in profiles.iterator():
+            total += rebuild_timeline(profile_id)
+        self.stdout.write(f'Wrote {total} timeline entries')
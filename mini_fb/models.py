@@ -3,11 +3,38 @@
 # Description: Django models for the mini_fb application.
 # Defines the Profile and StatusMessage models with their fields and methods.
 
-from django.db import models
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse
 
 from django.contrib.auth.models import User
 
+# number of friend suggestions shown, and how long (seconds) a ranking is cached
+SUGGESTION_LIMIT = 20
+SUGGESTION_CACHE_TIMEOUT = 60 * 60
+
+
+def friend_suggestions_cache_key(profile_id):
+    """Return the cache key holding the friend suggestion ranking for a profile."""
+    return f'mini_fb:friend_suggestions:{profile_id}'
+
+
+def invalidate_friend_suggestions(*profile_ids):
+    """Drop cached suggestions affected by a friendship change between these profiles.
+    
+    A new or removed friendship between a and b changes the suggestions of
+    a and b, and the mutual friend counts seen by every friend of a or b.
+    """
+    affected = set(profile_ids)
+    for column, other in (('profile1', 'profile2'), ('profile2', 'profile1')):
+        affected.update(Friend.objects.filter(**{f'{column}__in': profile_ids}).values_list(other, flat=True))
+    cache.delete_many([friend_suggestions_cache_key(pk) for pk in affected])
+
 
 
 class Profile(models.Model):
@@ -36,6 +63,20 @@ class Profile(models.Model):
     # data attributes of a profile:
     user = models.ForeignKey(User, on_delete=models.CASCADE) ## NEW
     
+    # friends remembered by get_friends() for the lifetime of this object
+    _friends_cache = None
+    
+    class Meta:
+        indexes = [
+            # the profile directory, in case-insensitive name order (see directory.py)
+            models.Index(Lower('last_name'), Lower('first_name'), 'id', name='profile_directory_idx'),
+            # the directory filtered to one city
+            models.Index(Lower('city'), Lower('last_name'), Lower('first_name'), 'id',
+                         name='profile_city_directory_idx'),
+            # name searches matching the first name
+            models.Index(Lower('first_name'), name='profile_first_name_idx'),
+        ]
+    
     def __str__(self):
         """Return a string representation of this Profile object."""
         return f'{self.first_name} {self.last_name}'
@@ -46,8 +87,9 @@ class Profile(models.Model):
         Uses Django's ORM to filter StatusMessage objects by this profile
         as the foreign key relationship.
         """
-        # filter all status messages that belong to this profile
-        all_status_messages = StatusMessage.objects.filter(profile=self)
+        # filter all status messages that belong to this profile,
+        # loading their images for the whole page in one extra query
+        all_status_messages = StatusMessage.objects.filter(profile=self).prefetch_related(status_images_prefetch())
         return all_status_messages
     
     def get_absolute_url(self):
@@ -63,33 +105,37 @@ class Profile(models.Model):
         
         Searches for Friend relationships where this profile is either
         profile1 or profile2, and returns the other profile in each relationship.
-        """
-        # Import Friend model here to avoid circular import
-        # Get all Friend objects where this profile is profile1
-        friends_as_profile1 = Friend.objects.filter(profile1=self)
-        
-        # Get all Friend objects where this profile is profile2  
-        friends_as_profile2 = Friend.objects.filter(profile2=self)
-        
-        # Create list to store friend profiles
-        friend_profiles = []
+        Both directions are fetched with a single UNION query that returns
+        the friend Profiles directly, so no query is run per friendship.
         
-        # Add friends where this profile is profile1 (get profile2)
-        for friendship in friends_as_profile1:
-            friend_profiles.append(friendship.profile2)
+        The result is remembered on this Profile object, so calling this
+        again while rendering the same page (templates, get_news_feed,
+        get_friend_suggestions) does not query again.
+        """
+        if self._friends_cache is None:
+            # friendships where this profile is profile1 -> the other side is profile2
+            friends_as_profile1 = Profile.objects.filter(profile2__profile1=self).select_related('user')
             
-        # Add friends where this profile is profile2 (get profile1)
-        for friendship in friends_as_profile2:
-            friend_profiles.append(friendship.profile1)
+            # friendships where this profile is profile2 -> the other side is profile1
+            friends_as_profile2 = Profile.objects.filter(profile1__profile2=self).select_related('user')
             
-        # Return the list of friend Profile objects
-        return friend_profiles
+            # UNION also drops duplicates
+            self._friends_cache = list(
+                friends_as_profile1.union(friends_as_profile2).order_by('first_name', 'last_name', 'id')
+            )
+        
+        # Return a copy so callers can modify their list safely
+        return list(self._friends_cache)
+    
+    def clear_friends_cache(self):
+        """Forget the friends remembered by get_friends(), e.g. after adding a friend."""
+        self._friends_cache = None
 
     def add_friend(self, other):
         """Add a friend relationship between this profile and another profile.
         
         Creates a Friend instance connecting self and other if:
-        - No existing friendship exists between them
+        - No existing friendship exists between them (in either direction)
         - The profiles are not the same (no self-friending)
         
         Args:
@@ -99,85 +145,105 @@ class Profile(models.Model):
         if self == other:
             # Don't allow self-friending
             return
-            
-        # Check if friendship already exists in either direction
-        # Check if self is profile1 and other is profile2
-        existing_friendship1 = Friend.objects.filter(
-            profile1=self, 
-            profile2=other
-        ).exists()
         
-        # Check if other is profile1 and self is profile2
-        existing_friendship2 = Friend.objects.filter(
-            profile1=other, 
-            profile2=self
-        ).exists()
+        # Friendships are stored once, with the smaller profile id as profile1.
+        # A single INSERT that skips the row if the pair already exists
+        # (ON CONFLICT DO NOTHING) replaces the two exists() checks and is
+        # safe when two requests add the same friendship at once.
+        low, high = sorted([self.pk, other.pk])
+        Friend.objects.bulk_create([Friend(profile1_id=low, profile2_id=high)], ignore_conflicts=True)
+        version = bump_graph_version()
+
+        # Both friend lists, and the suggestions around them, have changed
+        self.clear_friends_cache()
+        other.clear_friends_cache()
+        invalidate_friend_suggestions(self.pk, other.pk)
         
-        # If no existing friendship in either direction, create new Friend instance
-        if not existing_friendship1 and not existing_friendship2:
-            # Create and save new Friend relationship
-            new_friendship = Friend(profile1=self, profile2=other)
-            new_friendship.save()
-    
-    def get_friend_suggestions(self):
-        """Return a list of Profiles that could be friend suggestions.
+        # Show each other's existing statuses in the new friends' feeds
+        from .timeline import backfill_friendship
+        backfill_friendship(self.pk, other.pk)
+        
+        # Update the in-memory social graph once the friendship is committed
+        from .graph import friendship_added
+        transaction.on_commit(lambda: friendship_added(low, high, version))
+    
+    def get_friend_suggestions(self, limit=SUGGESTION_LIMIT):
+        """Return up to `limit` Profiles that could be friend suggestions.
         
         Returns profiles that are:
         - Not already friends with this profile
         - Not this profile itself
-        """
-        # Get all profiles
-        all_profiles = Profile.objects.all()
         
-        # Get current friends
-        current_friends = self.get_friends()
+        Friends of friends come first, ranked by how many mutual friends
+        they share with this profile (counted in SQL); if there are fewer
+        than `limit` of those, the newest other profiles fill the list.
+        Each returned Profile has a `mutual_friends` attribute.
         
-        # Create list for suggestions
-        suggestions = []
+        The ranking is cached per profile and invalidated whenever a
+        friendship involving this profile or one of its friends changes.
+        """
+        key = friend_suggestions_cache_key(self.pk)
+        cached = cache.get(key)
+        if cached is not None and cached[0] >= limit:
+            ranked = cached[1][:limit]
+        else:
+            ranked = self._rank_friend_suggestions(limit)
+            # remember which limit the ranking was computed for
+            cache.set(key, (limit, ranked), SUGGESTION_CACHE_TIMEOUT)
         
-        # Check each profile
-        for profile in all_profiles:
-            # Skip if it's the same profile
-            if profile == self:
-                continue
-            # Skip if already friends
-            if profile in current_friends:
-                continue
-            # Add to suggestions
-            suggestions.append(profile)
-            
-        # Return the list of suggested profiles
+        # One query for the suggested profiles, returned in ranked order
+        profiles = Profile.objects.in_bulk([pk for pk, _ in ranked])
+        suggestions = []
+        for pk, mutual in ranked:
+            if pk in profiles:
+                profiles[pk].mutual_friends = mutual
+                suggestions.append(profiles[pk])
         return suggestions
     
+    def _rank_friend_suggestions(self, limit):
+        """Return [(profile id, mutual friend count)] for the best `limit` suggestions."""
+        friend_ids = [friend.pk for friend in self.get_friends()]
+        excluded = set(friend_ids)
+        excluded.add(self.pk)
+        
+        # Friends of friends: the other side of every friendship of a friend.
+        # Friendships are stored in canonical order, so both columns are searched.
+        mutual_counts = Counter()
+        if friend_ids:
+            for column, other in (('profile1', 'profile2'), ('profile2', 'profile1')):
+                rows = (Friend.objects.filter(**{f'{column}__in': friend_ids})
+                        .values_list(other).annotate(mutual=models.Count('id')).order_by())
+                for pk, mutual in rows:
+                    if pk not in excluded:
+                        mutual_counts[pk] += mutual
+        
+        # Most mutual friends first; ties go to the lower (older) profile id
+        ranked = sorted(mutual_counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        
+        # Pad with the newest profiles that are not friends or already suggested
+        if len(ranked) < limit:
+            excluded.update(pk for pk, _ in ranked)
+            newest = (Profile.objects.exclude(pk__in=excluded).order_by('-pk')
+                      .values_list('pk', flat=True)[:limit - len(ranked)])
+            ranked.extend((pk, 0) for pk in newest)
+        return ranked
     
     def get_news_feed(self):
-        """Return a QuerySet of StatusMessages for this profile's news feed.
+        """Return the first page of this profile's news feed as a list of StatusMessages.
         
         The news feed includes:
         - All status messages posted by this profile
         - All status messages posted by friends of this profile
         Ordered by most recent first.
-        """
-        # Import StatusMessage model here to avoid circular import at top of file
-        from .models import StatusMessage
-        
-        # Get list of friends
-        friends = self.get_friends()
         
-        # Create list to hold all profiles whose statuses we want
-        profiles_to_include = [self]  # Start with self
-        
-        # Add all friends to the list
-        profiles_to_include.extend(friends)
-        
-        # Use Django ORM to filter StatusMessages
-        # Get all status messages where profile is in our list
-        news_feed = StatusMessage.objects.filter(
-            profile__in=profiles_to_include
-        ).order_by('-timestamp')  # Order by most recent first
+        The feed is read from this profile's materialized timeline; see
+        timeline.get_feed_page() for later pages.
+        """
+        # Import here because timeline.py imports this module
+        from .timeline import get_feed_page
         
-        # Return the QuerySet of status messages
-        return news_feed
+        feed, next_cursor = get_feed_page(self)
+        return feed
     
 class StatusMessage(models.Model):
     """Model representing a status message posted by a user.
@@ -196,18 +262,66 @@ class StatusMessage(models.Model):
     # the actual status message content - required field
     message = models.TextField(blank=False)
     
+    # False when the author had too many friends to copy this status into
+    # every friend's timeline; such statuses are merged into feeds at read time
+    fanned_out = models.BooleanField(default=True)
+    
+    class Meta:
+        indexes = [
+            # statuses read at feed time (fan-out on read), newest first per author
+            models.Index(fields=['profile', '-timestamp', '-id'], condition=models.Q(fanned_out=False),
+                         name='status_fanout_on_read_idx'),
+        ]
+    
     def __str__(self):
         """Return a string representation of this StatusMessage object."""
         return f'{self.message}'
     
     def get_images(self):
-        """Return all Images associated with this StatusMessage."""
-        # Get all StatusImage objects for this status message
-        status_images = StatusImage.objects.filter(status_message=self)
+        """Return all Images associated with this StatusMessage.
+        
+        Uses the images loaded by status_images_prefetch() when the status
+        came from a prefetching queryset; otherwise runs one query.
+        """
+        if 'statusimage_set' in getattr(self, '_prefetched_objects_cache', {}):
+            status_images = self.statusimage_set.all()
+        else:
+            # Get all StatusImage objects for this status message, with their Image
+            status_images = StatusImage.objects.filter(status_message=self).select_related('image')
         # Extract the Image objects
         images = [si.image for si in status_images]
         return images
     
+class TimelineEntry(models.Model):
+    """Model representing one status message in one profile's news feed.
+    
+    Rows are written when a status is posted ("fan-out on write") so that a
+    feed is read with one indexed range scan instead of being recomputed
+    from the friend list on every visit.
+    """
+    
+    # profile whose news feed contains the status
+    owner = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='timeline_entries')
+    
+    # the status message shown; deleting it removes it from every timeline
+    status = models.ForeignKey(StatusMessage, on_delete=models.CASCADE)
+    
+    # copy of status.timestamp, so the feed can be ordered from this table alone
+    timestamp = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'status'], name='timeline_unique_owner_status'),
+        ]
+        indexes = [
+            # one profile's feed, newest first, matching the (timestamp, id) cursor
+            models.Index(fields=['owner', '-timestamp', '-status'], name='timeline_owner_recent_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.status} in {self.owner}'s feed"
+    
+    
 class Image(models.Model):
     """Model representing an image uploaded by a user."""
     
@@ -223,11 +337,29 @@ class Image(models.Model):
     # Optional caption for the image
     caption = models.TextField(blank=True)
     
+    # Downscaled copy for display, generated in the background after upload
+    thumbnail = models.ImageField(upload_to='thumbnails/', blank=True)
+    
     def __str__(self):
         return f"Image uploaded by {self.profile} at {self.timestamp}"
     
+    def get_display_url(self):
+        """Return the URL to show this image at: its thumbnail once generated, else the original."""
+        if self.thumbnail:
+            return self.thumbnail.url
+        return self.image_file.url
+    
     
     
+def status_images_prefetch():
+    """Return a Prefetch loading the StatusImages, with their Images, of many statuses in one query.
+    
+    Use with prefetch_related() or prefetch_related_objects(); get_images()
+    then reads the prefetched images instead of querying per status.
+    """
+    return models.Prefetch('statusimage_set', queryset=StatusImage.objects.select_related('image'))
+
+
 class StatusImage(models.Model):
     """Model representing the relationship between StatusMessage and Image."""
     
@@ -245,7 +377,8 @@ class Friend(models.Model):
     """Model representing a friendship relationship between two profiles.
     
     This model creates an edge in the social network graph connecting
-    two Profile nodes as friends.
+    two Profile nodes as friends. Friendship is undirected, so each pair is
+    stored once in canonical order: profile1 always has the smaller id.
     """
     
     # First profile in the friendship relationship
@@ -262,7 +395,130 @@ class Friend(models.Model):
     # Timestamp when the friendship was created
     timestamp = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        constraints = [
+            # one row per pair; its index also serves lookups by profile1
+            models.UniqueConstraint(fields=['profile1', 'profile2'], name='friend_unique_pair'),
+            # canonical order, which also rules out self-friendship
+            models.CheckConstraint(condition=models.Q(profile1__lt=models.F('profile2')), name='friend_canonical_order'),
+        ]
+        indexes = [
+            # look up a profile's friendships from the profile2 side
+            models.Index(fields=['profile2', 'profile1'], name='friend_profile2_profile1_idx'),
+        ]
+    
     def __str__(self):
         """Return a string representation of this Friend relationship."""
         # Display both profiles' names in the friendship
-        return f"{self.profile1.first_name} {self.profile1.last_name} & {self.profile2.first_name} {self.profile2.last_name}"
\ No newline at end of file
+        return f"{self.profile1.first_name} {self.profile1.last_name} & {self.profile2.first_name} {self.profile2.last_name}"
+    
+    def save(self, *args, **kwargs):
+        """Store the pair in canonical order (smaller profile id first) before saving."""
+        if self.profile1_id is not None and self.profile2_id is not None and self.profile1_id > self.profile2_id:
+            self.profile1_id, self.profile2_id = self.profile2_id, self.profile1_id
+        super().save(*args, **kwargs)
+
+
+class SocialGraphVersion(models.Model):
+    """Single row counting the changes made to the Friend table.
+    
+    Every friendship added or removed increments it in the same transaction,
+    so every process can tell its in-memory social graph (graph.py) is out
+    of date, not only the one that made the change.
+    """
+    version = models.BigIntegerField(default=0)
+
+
+def bump_graph_version():
+    """Increment the social graph version in the current transaction and return the new value."""
+    if not SocialGraphVersion.objects.filter(pk=1).update(version=models.F('version') + 1):
+        SocialGraphVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+    return SocialGraphVersion.objects.values_list('version', flat=True).get(pk=1)
+
+
+def canonicalize_friendships(apps=None, schema_editor=None):
+    """Rewrite existing Friend rows into canonical order and remove duplicates.
+    
+    Needed once before friend_unique_pair and friend_canonical_order can be
+    added to a database that already has friendships. For each unordered
+    pair the oldest row is kept, flipped if stored as (larger, smaller);
+    later duplicates and self-friendships are deleted.
+    
+    Has the signature of a RunPython migration operation, so it can be used
+    directly as the data migration that precedes the constraints.
+    
+    Returns:
+        dict: Number of rows 'flipped' and 'deleted'
+    """
+    friend_model = apps.get_model('mini_fb', 'Friend') if apps is not None else Friend
+    
+    seen = set()
+    to_delete = []
+    to_flip = []
+    for pk, first, second in friend_model.objects.order_by('timestamp', 'id').values_list('id', 'profile1_id', 'profile2_id'):
+        pair = (min(first, second), max(first, second))
+        if first == second or pair in seen:
+            to_delete.append(pk)
+            continue
+        seen.add(pair)
+        if first > second:
+            to_flip.append((pk, pair))
+    
+    with transaction.atomic():
+        # delete duplicates first so flipped rows never collide with them
+        for start in range(0, len(to_delete), 1000):
+            friend_model.objects.filter(id__in=to_delete[start:start + 1000]).delete()
+        for pk, (low, high) in to_flip:
+            friend_model.objects.filter(id=pk).update(profile1_id=low, profile2_id=high)
+    
+    return {'flipped': len(to_flip), 'deleted': len(to_delete)}
+
+
+@receiver(post_save, sender=Friend)
+def friendship_saved(sender, instance, created, **kwargs):
+    """Update suggestions, timelines and the social graph when a Friend row is saved."""
+    from .graph import friendship_added
+    from .timeline import backfill_friendship
+    
+    invalidate_friend_suggestions(instance.profile1_id, instance.profile2_id)
+    if created:
+        backfill_friendship(instance.profile1_id, instance.profile2_id)
+        version = bump_graph_version()
+        transaction.on_commit(lambda: friendship_added(instance.profile1_id, instance.profile2_id, version))
+
+
+@receiver(post_delete, sender=Friend)
+def friendship_deleted(sender, instance, **kwargs):
+    """Update suggestions, timelines and the social graph on unfriend."""
+    from .graph import friendship_removed
+    from .timeline import prune_friendship
+    
+    invalidate_friend_suggestions(instance.profile1_id, instance.profile2_id)
+    prune_friendship(instance.profile1_id, instance.profile2_id)
+    version = bump_graph_version()
+    transaction.on_commit(lambda: friendship_removed(instance.profile1_id, instance.profile2_id, version))
+
+
+@receiver(post_save, sender=StatusMessage)
+def status_message_saved(sender, instance, created, using, **kwargs):
+    """Fan a new status out to timelines, or keep timeline order in step after an edit.
+    
+    Either way the status's words are (re)indexed for search.
+    """
+    from .search import index_status
+    from .timeline import fan_out_status
+    
+    if created:
+        fan_out_status(instance)
+    else:
+        # timestamp is auto_now, so editing a status moves it to the top of feeds
+        TimelineEntry.objects.filter(status=instance).update(timestamp=instance.timestamp)
+    index_status(instance, using)
+
+
+@receiver(post_delete, sender=StatusMessage)
+def status_message_deleted(sender, instance, using, **kwargs):
+    """Remove a deleted status from the search index."""
+    from .search import unindex_status
+    
+    unindex_status(instance.pk, using)
@@ -0,0 +1,167 @@
+# File: search.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Full-text search over the status messages a profile can see.
+# Messages are indexed in a SQLite FTS5 table kept in step with StatusMessage
+# by signals; a search matches words in the index, keeps only statuses by the
+# viewer and their friends, and ranks the matches by bm25.
+
+import re
+
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .models import Friend, StatusMessage, status_images_prefetch
+
+# FTS5 table holding the words of every status message, keyed by status id
+SEARCH_TABLE = 'mini_fb_statusmessage_search'
+
+# number of statuses shown per results page
+SEARCH_PAGE_SIZE = 20
+
+# databases (by alias) on which SEARCH_TABLE is known to exist
+_index_ready = set()
+
+
+def query_terms(query):
+    """Split a search query into lowercase words."""
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def match_query(terms):
+    """Build an FTS5 query matching statuses that contain every term; the last may be a prefix."""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' AND '.join(quoted)
+
+
+def ensure_search_index(using='default'):
+    """Create and fill SEARCH_TABLE if it does not exist yet.
+
+    Returns:
+        bool: True if the index is available (always False on databases other than SQLite)
+    """
+    if using in _index_ready:
+        return True
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+
+    if SEARCH_TABLE not in connection.introspection.table_names():
+        rebuild_search_index(using)
+    # the table may have been created by the current transaction, and is
+    # gone again if that rolls back, so only remember it once committed
+    transaction.on_commit(lambda: _index_ready.add(using), using=using)
+    return True
+
+
+def rebuild_search_index(using='default'):
+    """Create SEARCH_TABLE if needed and refill it from the StatusMessage table.
+
+    Returns:
+        int: Number of statuses indexed (0 on databases other than SQLite)
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return 0
+
+    table = connection.ops.quote_name(SEARCH_TABLE)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            f"message, tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(
+            f'INSERT INTO {table}(rowid, message) '
+            f'SELECT id, message FROM {connection.ops.quote_name(StatusMessage._meta.db_table)}'
+        )
+        cursor.execute(f'SELECT count(*) FROM {table}')
+        return cursor.fetchone()[0]
+
+
+def index_status(status, using='default'):
+    """Add a new or edited status message to the search index."""
+    if not ensure_search_index(using):
+        return
+    table = connections[using].ops.quote_name(SEARCH_TABLE)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [status.pk])
+        cursor.execute(f'INSERT INTO {table}(rowid, message) VALUES (%s, %s)', [status.pk, status.message])
+
+
+def unindex_status(status_id, using='default'):
+    """Remove a deleted status message from the search index."""
+    if not ensure_search_index(using):
+        return
+    table = connections[using].ops.quote_name(SEARCH_TABLE)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [status_id])
+
+
+def visible_profiles_sql(using='default'):
+    """SQL (with three %s parameters: the viewer's id each time) selecting the viewer and their friends."""
+    quote = connections[using].ops.quote_name
+    friends = quote(Friend._meta.db_table)
+    return (
+        f'SELECT %s '
+        f'UNION SELECT profile2_id FROM {friends} WHERE profile1_id = %s '
+        f'UNION SELECT profile1_id FROM {friends} WHERE profile2_id = %s'
+    )
+
+
+def index_matches(profile, terms, limit, offset, using='default'):
+    """Return ids of statuses visible to `profile` matching the terms, best bm25 rank first."""
+    connection = connections[using]
+    table = connection.ops.quote_name(SEARCH_TABLE)
+    statuses = connection.ops.quote_name(StatusMessage._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT s.rowid FROM {table} AS s '
+            f'JOIN {statuses} AS m ON m.id = s.rowid '
+            f'WHERE {table} MATCH %s AND m.profile_id IN ({visible_profiles_sql(using)}) '
+            f'ORDER BY s.rank, s.rowid DESC LIMIT %s OFFSET %s',
+            [match_query(terms), profile.pk, profile.pk, profile.pk, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def substring_matches(profile, terms, limit, offset, using='default'):
+    """Return ids of visible statuses containing every term, newest first, without the index."""
+    as_profile1 = Friend.objects.using(using).filter(profile1=profile).values('profile2_id')
+    as_profile2 = Friend.objects.using(using).filter(profile2=profile).values('profile1_id')
+    condition = Q(profile=profile) | Q(profile_id__in=as_profile1) | Q(profile_id__in=as_profile2)
+    for term in terms:
+        condition &= Q(message__icontains=term)
+    return list(StatusMessage.objects.using(using).filter(condition)
+                .order_by('-timestamp', '-id').values_list('id', flat=True)[offset:offset + limit])
+
+
+def search_statuses(profile, query, page=1, limit=SEARCH_PAGE_SIZE, using='default'):
+    """Search the status messages of a profile and their friends.
+
+    Matching and the friend filter both run in one query against the FTS5
+    index, so the cost depends on how many statuses match, not on how many
+    exist. On databases without FTS5 this falls back to substring matching,
+    newest first.
+
+    Args:
+        profile: The Profile searching; only their and their friends' statuses are searched
+        query (str): Words to find; the last one also matches as a prefix
+        page (int): 1-based results page
+
+    Returns:
+        tuple: (list of StatusMessage for this page, True if there is a next page)
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+
+    offset = (page - 1) * limit
+    if ensure_search_index(using):
+        ids = index_matches(profile, terms, limit + 1, offset, using)
+    else:
+        ids = substring_matches(profile, terms, limit + 1, offset, using)
+
+    statuses = (StatusMessage.objects.using(using).select_related('profile')
+                .prefetch_related(status_images_prefetch()).in_bulk(ids[:limit]))
+    return [statuses[pk] for pk in ids[:limit] if pk in statuses], len(ids) > limit
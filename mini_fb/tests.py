@@ -1,3 +1,193 @@
 from django.test import TestCase
 
 # Create your tests here.
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import graph
+from .models import Friend, Image, Profile, StatusImage, StatusMessage, bump_graph_version
+from .timeline import get_feed_page
+from .uploads import atomic_upload, save_status_images
+
+
+def make_profile(name):
+    """Create a Profile (and its User) named `name`."""
+    user = User.objects.create_user(username=name)
+    return Profile.objects.create(user=user, first_name=name, last_name='Test',
+                                  city='Boston', email_address=f'{name}@example.com')
+
+
+def post_statuses(profile, count, images_per_status=2):
+    """Post `count` statuses by `profile`, each with `images_per_status` images."""
+    for n in range(count):
+        status = StatusMessage.objects.create(profile=profile, message=f'Status {n}')
+        for k in range(images_per_status):
+            image = Image.objects.create(profile=profile, image_file=f'status-{status.pk}-{k}.jpg')
+            StatusImage.objects.create(status_message=status, image=image)
+
+
+def make_friends(profile, count, prefix):
+    """Give `profile` `count` new friends, each with one friend of their own."""
+    for n in range(count):
+        friend = make_profile(f'{prefix}-friend-{n}')
+        profile.add_friend(friend)
+        friend.add_friend(make_profile(f'{prefix}-fof-{n}'))
+
+
+def count_queries(function):
+    """Run function() and return how many queries it ran."""
+    with CaptureQueriesContext(connection) as queries:
+        function()
+    return len(queries)
+
+
+class QueryCountTests(TestCase):
+    """The feed, profile and friend pages run the same number of queries however much data they show."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_news_feed_queries_do_not_grow_with_statuses(self):
+        small, large = make_profile('small'), make_profile('large')
+        post_statuses(small, 10)
+        post_statuses(large, 100)
+
+        def read_feed(profile):
+            # a page large enough to hold every status, so all 100 are read
+            statuses, _ = get_feed_page(Profile.objects.get(pk=profile.pk), limit=100)
+            for status in statuses:
+                list(status.get_images())
+                list(status.get_images())
+            return statuses
+
+        expected = count_queries(lambda: read_feed(small))
+        with self.assertNumQueries(expected):
+            statuses = read_feed(large)
+        self.assertEqual(len(statuses), 100)
+
+    def test_profile_statuses_queries_do_not_grow_with_statuses(self):
+        small, large = make_profile('small'), make_profile('large')
+        post_statuses(small, 2)
+        post_statuses(large, 100)
+
+        def read_statuses(profile):
+            for status in Profile.objects.get(pk=profile.pk).get_all_StatusMessage():
+                list(status.get_images())
+
+        expected = count_queries(lambda: read_statuses(small))
+        with self.assertNumQueries(expected):
+            read_statuses(large)
+
+    def test_get_friends_queries_do_not_grow_with_friends(self):
+        small, large = make_profile('small'), make_profile('large')
+        make_friends(small, 2, 'small')
+        make_friends(large, 20, 'large')
+
+        expected = count_queries(lambda: Profile.objects.get(pk=small.pk).get_friends())
+        with self.assertNumQueries(expected):
+            friends = Profile.objects.get(pk=large.pk).get_friends()
+        self.assertEqual(len(friends), 20)
+
+    def test_friend_suggestions_queries_do_not_grow_with_friends(self):
+        small, large = make_profile('small'), make_profile('large')
+        make_friends(small, 2, 'small')
+        make_friends(large, 20, 'large')
+
+        # a limit above both counts of friends of friends, so both fill up with other profiles
+        expected = count_queries(lambda: Profile.objects.get(pk=small.pk).get_friend_suggestions(limit=50))
+        with self.assertNumQueries(expected):
+            suggestions = Profile.objects.get(pk=large.pk).get_friend_suggestions(limit=50)
+        self.assertTrue(suggestions)
+
+    @override_settings(ROOT_URLCONF='mini_fb.urls')
+    def test_profile_page_queries_do_not_grow_with_statuses(self):
+        small, large = make_profile('small'), make_profile('large')
+        post_statuses(small, 2)
+        post_statuses(large, 50)
+
+        expected = count_queries(lambda: self.client.get(f'/profile/{small.pk}'))
+        with self.assertNumQueries(expected):
+            response = self.client.get(f'/profile/{large.pk}')
+        self.assertEqual(response.status_code, 200)
+
+
+class StatusImageUploadTests(TestCase):
+    """Uploaded files live exactly as long as the rows that point at them."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.profile = make_profile('uploader')
+
+    def post_status(self, stored):
+        """Post a status with two uploaded images, recording the stored files in `stored`."""
+        status = StatusMessage.objects.create(profile=self.profile, message='Photos')
+        files = [SimpleUploadedFile(f'photo{n}.jpg', b'not really a jpeg') for n in range(2)]
+        save_status_images(status, self.profile, files, stored)
+
+    def storage(self):
+        return Image._meta.get_field('image_file').storage
+
+    def test_files_are_kept_when_the_transaction_commits(self):
+        with atomic_upload() as stored:
+            self.post_status(stored)
+        self.assertEqual(len(stored), 2)
+        self.assertTrue(all(self.storage().exists(name) for name in stored))
+        self.assertEqual(StatusImage.objects.count(), 2)
+
+    def test_files_are_deleted_when_the_transaction_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_upload() as stored:
+                self.post_status(stored)
+                raise RuntimeError('the request failed after the upload')
+        self.assertEqual(len(stored), 2)
+        self.assertFalse(any(self.storage().exists(name) for name in stored))
+        self.assertFalse(StatusMessage.objects.exists())
+
+
+class SocialGraphVersionTests(TestCase):
+    """The in-memory social graph notices friendships changed by other processes."""
+
+    def setUp(self):
+        graph.reset_social_graph()
+        self.addCleanup(graph.reset_social_graph)
+        self.a, self.b, self.c = make_profile('a'), make_profile('b'), make_profile('c')
+
+    def expire_version_check(self, social_graph):
+        social_graph.checked_at -= graph.GRAPH_VERSION_CHECK_INTERVAL + 1
+
+    def test_change_from_another_process_reloads_the_graph(self):
+        loaded = graph.get_social_graph()
+        self.assertEqual(loaded.friends(self.a.pk), [])
+
+        # another process: the row and the version change, but not this process's graph
+        Friend.objects.bulk_create([Friend(profile1=self.a, profile2=self.b)])
+        bump_graph_version()
+        self.assertIs(graph.get_social_graph(), loaded)
+
+        self.expire_version_check(loaded)
+        reloaded = graph.get_social_graph()
+        self.assertIsNot(reloaded, loaded)
+        self.assertEqual(reloaded.friends(self.a.pk), [self.b.pk])
+
+    def test_change_from_this_process_is_applied_without_reloading(self):
+        loaded = graph.get_social_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.add_friend(self.b)
+        with self.captureOnCommitCallbacks(execute=True):
+            Friend.objects.create(profile1=self.b, profile2=self.c)
+
+        self.expire_version_check(loaded)
+        self.assertIs(graph.get_social_graph(), loaded)
+        self.assertEqual(loaded.friends(self.b.pk), [self.a.pk, self.c.pk])
+        self.assertEqual(loaded.version, graph.read_graph_version())
@@ -0,0 +1,166 @@
+# File: timeline.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Materialized news feed timelines for the mini_fb application.
+# A new status is written ("fanned out") to the timeline of its author and
+# every friend, so reading a feed is a single indexed range scan. Authors
+# with very many friends are skipped on write and merged in at read time.
+
+import base64
+import binascii
+import heapq
+import json
+from datetime import datetime
+
+from django.db.models import Q, prefetch_related_objects
+
+from .models import Friend, StatusMessage, TimelineEntry, status_images_prefetch
+
+# authors with more friends than this are not fanned out on write;
+# their statuses are read directly when a feed is built
+FANOUT_FRIEND_LIMIT = 1000
+
+# number of statuses shown per feed page
+FEED_PAGE_SIZE = 20
+
+# rows inserted per statement when fanning out or backfilling
+BATCH_SIZE = 1000
+
+
+def friend_ids(profile_id):
+    """Return the ids of a profile's friends with one UNION query.
+
+    Friendships are stored once per pair, so both columns are searched.
+    """
+    as_profile1 = Friend.objects.filter(profile1_id=profile_id).values_list('profile2_id', flat=True)
+    as_profile2 = Friend.objects.filter(profile2_id=profile_id).values_list('profile1_id', flat=True)
+    return list(as_profile1.union(as_profile2))
+
+
+def fan_out_status(status):
+    """Write a new status to the timelines of its author and the author's friends.
+
+    If the author has more than FANOUT_FRIEND_LIMIT friends the status is
+    marked as not fanned out instead, and feeds pick it up at read time.
+    """
+    friends = friend_ids(status.profile_id)
+    if len(friends) > FANOUT_FRIEND_LIMIT:
+        StatusMessage.objects.filter(pk=status.pk).update(fanned_out=False)
+        status.fanned_out = False
+        return
+
+    entries = [
+        TimelineEntry(owner_id=owner_id, status_id=status.pk, timestamp=status.timestamp)
+        for owner_id in [status.profile_id] + friends
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def backfill_friendship(profile_a_id, profile_b_id):
+    """Copy each profile's fanned-out statuses into the other's timeline (new friendship)."""
+    for owner_id, author_id in ((profile_a_id, profile_b_id), (profile_b_id, profile_a_id)):
+        statuses = (StatusMessage.objects.filter(profile_id=author_id, fanned_out=True)
+                    .values_list('pk', 'timestamp').iterator(chunk_size=BATCH_SIZE))
+        entries = [
+            TimelineEntry(owner_id=owner_id, status_id=pk, timestamp=timestamp)
+            for pk, timestamp in statuses
+        ]
+        TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def prune_friendship(profile_a_id, profile_b_id):
+    """Remove each profile's statuses from the other's timeline (friendship removed)."""
+    TimelineEntry.objects.filter(
+        Q(owner_id=profile_a_id, status__profile_id=profile_b_id)
+        | Q(owner_id=profile_b_id, status__profile_id=profile_a_id)
+    ).delete()
+
+
+def rebuild_timeline(profile_id):
+    """Recreate one profile's timeline from scratch (e.g. for data created before timelines).
+
+    Returns:
+        int: Number of timeline entries written
+    """
+    TimelineEntry.objects.filter(owner_id=profile_id).delete()
+    authors = [profile_id] + friend_ids(profile_id)
+
+    written = 0
+    for start in range(0, len(authors), BATCH_SIZE):
+        statuses = (StatusMessage.objects.filter(profile_id__in=authors[start:start + BATCH_SIZE], fanned_out=True)
+                    .values_list('pk', 'timestamp').iterator(chunk_size=BATCH_SIZE))
+        entries = [
+            TimelineEntry(owner_id=profile_id, status_id=pk, timestamp=timestamp)
+            for pk, timestamp in statuses
+        ]
+        TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        written += len(entries)
+    return written
+
+
+def encode_cursor(status):
+    """Encode a status's feed position (timestamp, id) as an opaque URL-safe string."""
+    raw = json.dumps([status.timestamp.isoformat(), status.pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor(); returns (timestamp, id) or None if malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (binascii.Error, ValueError, TypeError, UnicodeError):
+        return None
+
+
+def older_than(position, timestamp_field, id_field):
+    """Q selecting rows strictly after `position` in (timestamp desc, id desc) order."""
+    timestamp, pk = position
+    return Q(**{f'{timestamp_field}__lt': timestamp}) | Q(**{timestamp_field: timestamp, f'{id_field}__lt': pk})
+
+
+def get_feed_page(profile, cursor=None, limit=FEED_PAGE_SIZE):
+    """Return one page of a profile's news feed, newest first.
+
+    Statuses come from the profile's materialized timeline, merged with the
+    statuses of authors that were not fanned out on write (read directly,
+    "fan-out on read"). Pages are selected with a (timestamp, id) cursor
+    rather than an offset, so every page costs the same. Status images are
+    prefetched, so rendering the page runs no further queries.
+
+    Args:
+        profile: The Profile whose feed to show
+        cursor (str): next_cursor of the previous page, or None for the first page
+        limit (int): Number of statuses per page
+
+    Returns:
+        tuple: (list of StatusMessage, next_cursor or None if this is the last page)
+    """
+    position = decode_cursor(cursor)
+
+    entries = TimelineEntry.objects.filter(owner=profile)
+    if position is not None:
+        entries = entries.filter(older_than(position, 'timestamp', 'status_id'))
+    written = [
+        entry.status for entry in
+        entries.select_related('status__profile').order_by('-timestamp', '-status_id')[:limit + 1]
+    ]
+
+    # statuses by this profile or its friends that skipped fan-out on write
+    authors = [profile.pk] + friend_ids(profile.pk)
+    pulled = StatusMessage.objects.filter(profile_id__in=authors, fanned_out=False)
+    if position is not None:
+        pulled = pulled.filter(older_than(position, 'timestamp', 'id'))
+    read = list(pulled.select_related('profile').order_by('-timestamp', '-id')[:limit + 1])
+
+    # both lists are sorted newest first; merge them and keep one page
+    merged = list(heapq.merge(written, read, key=lambda status: (status.timestamp, status.pk), reverse=True))
+    page = merged[:limit]
+
+    # load the images of every status on the page in one query
+    prefetch_related_objects(page, status_images_prefetch())
+
+    next_cursor = encode_cursor(page[-1]) if len(merged) > limit else None
+    return page, next_cursor
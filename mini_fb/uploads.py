@@ -0,0 +1,144 @@
+# File: uploads.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Image uploads for status messages in the mini_fb application.
+# Uploaded files are written to storage concurrently, their database rows are
+# inserted in bulk, and thumbnails are generated afterwards on a background
+# worker so the request does not wait for them.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+
+from PIL import Image as PILImage
+
+from .models import Image, StatusImage
+
+# threads writing one request's uploaded files to storage
+UPLOAD_WORKERS = 4
+
+# largest width and height of a generated thumbnail, in pixels
+THUMBNAIL_SIZE = (600, 600)
+
+# background queue generating thumbnails after the upload has committed
+THUMBNAIL_QUEUE = ThreadPoolExecutor(max_workers=2, thread_name_prefix='mini_fb-thumbnails')
+
+
+def store_upload(file):
+    """Write one uploaded file to the Image storage and return its stored name."""
+    field = Image._meta.get_field('image_file')
+    return field.storage.save(field.generate_filename(None, file.name), file)
+
+
+def delete_stored(names):
+    """Delete stored upload files by name."""
+    storage = Image._meta.get_field('image_file').storage
+    for name in names:
+        storage.delete(name)
+
+
+@contextmanager
+def atomic_upload(using=None):
+    """Run a block in a transaction, deleting the files uploaded in it if it rolls back.
+
+    Storage is not transactional: files written by save_status_images()
+    stay on disk even if the rows pointing at them are rolled back. Yields a
+    list to pass to save_status_images() as `stored`; if the block raises or
+    is marked for rollback, every file recorded in it is deleted.
+
+    Files are kept once this block commits. If it is nested inside an
+    outer transaction that rolls back later, wrap that outer transaction
+    instead.
+    """
+    stored = []
+    rolled_back = True
+    try:
+        with transaction.atomic(using=using):
+            yield stored
+            rolled_back = transaction.get_rollback(using=using)
+    finally:
+        if rolled_back:
+            delete_stored(stored)
+
+
+def save_status_images(status, profile, files, stored=None):
+    """Store uploaded files and attach them as Images of a status message.
+
+    The files are written to storage on a thread pool, then every Image and
+    StatusImage row is inserted with one bulk query each. Call inside
+    atomic_upload() and pass its list as `stored`: the rows then commit
+    together with the status, and the files are deleted if they don't.
+    Thumbnails are queued once the transaction commits.
+
+    Returns:
+        list: The created Image objects
+    """
+    if not files:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(files))) as pool:
+        names = list(pool.map(store_upload, files))
+    if stored is not None:
+        stored.extend(names)
+
+    try:
+        with transaction.atomic():
+            images = Image.objects.bulk_create(
+                [Image(profile=profile, image_file=name, caption='') for name in names]
+            )
+            StatusImage.objects.bulk_create(
+                [StatusImage(status_message=status, image=image) for image in images]
+            )
+    except Exception:
+        # don't leave files behind for rows that were never written
+        if stored is None:
+            delete_stored(names)
+        raise
+
+    image_ids = [image.pk for image in images]
+    transaction.on_commit(lambda: queue_thumbnails(image_ids))
+    return images
+
+
+def queue_thumbnails(image_ids):
+    """Generate thumbnails for these Images on the background queue."""
+    for image_id in image_ids:
+        THUMBNAIL_QUEUE.submit(run_thumbnail_task, image_id)
+
+
+def run_thumbnail_task(image_id):
+    """Worker entry point: generate one thumbnail, then release the thread's connections."""
+    try:
+        generate_thumbnail(image_id)
+    finally:
+        connections.close_all()
+
+
+def generate_thumbnail(image_id):
+    """Save a downscaled copy of an Image as its thumbnail.
+
+    Images that were deleted meanwhile, or whose file cannot be read as a
+    picture, are skipped and keep showing the original.
+
+    Returns:
+        bool: True if a thumbnail was saved
+    """
+    try:
+        image = Image.objects.get(pk=image_id)
+        with image.image_file.open('rb') as source:
+            picture = PILImage.open(source)
+            picture_format = picture.format
+            picture.thumbnail(THUMBNAIL_SIZE)
+            buffer = BytesIO()
+            picture.save(buffer, format=picture_format)
+    except (Image.DoesNotExist, OSError, ValueError):
+        return False
+
+    field = Image._meta.get_field('thumbnail')
+    name = field.generate_filename(image, os.path.basename(image.image_file.name))
+    stored = field.storage.save(name, ContentFile(buffer.getvalue()))
+    Image.objects.filter(pk=image_id).update(thumbnail=stored)
+    return True
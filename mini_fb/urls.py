@@ -65,6 +65,13 @@ urlpatterns = [
     
     # map news feed URL to show news feed view
     path('profile/news_feed', ShowNewsFeedView.as_view(), name='news_feed'),
+    
+    # search the status messages of the logged-in user and their friends
+    path('status/search', SearchStatusMessagesView.as_view(), name='search_status'),
+    
+    # friendship graph queries (JSON)
+    path('profile/<int:pk>/network', ProfileNetworkView.as_view(), name='profile_network'),
+    path('profile/<int:pk>/connection/<int:other_pk>', ProfileConnectionView.as_view(), name='profile_connection'),
 
     path('login/', auth_views.LoginView.as_view(template_name='mini_fb/login.html'), name='login'), ## NEW
     
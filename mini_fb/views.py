@@ -13,10 +13,25 @@ Views:
 4. CreateStatusMessageView - Handles creating new status messages for a profile
 """
 
-from django.shortcuts import render, redirect
+import logging
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse
 
 # import the Profile model to work with profile data
 from .models import Profile, StatusMessage
+# materialized news feed pages
+from .timeline import get_feed_page
+# bulk image uploads for status messages
+from .uploads import atomic_upload, save_status_images
+# the logged-in user's profile, resolved once per request
+from .current_profile import CurrentProfileMixin, get_current_profile
+# in-memory friendship graph for mutual friends and degrees of separation
+from .graph import get_social_graph
+# cursor-paginated profile directory
+from .directory import get_directory_page
+# full-text search over visible status messages
+from .search import search_statuses
 # import Django's generic class-based views for common operations
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 # import our custom forms for profile and status message creation
@@ -29,13 +44,16 @@ from django.contrib.auth.forms import UserCreationForm ## NEW
 from django.contrib.auth.models import User ## NEW
 from django.contrib.auth import login # NEW
 
+# debug output from the views; silent unless DEBUG logging is enabled for mini_fb
+logger = logging.getLogger(__name__)
 
 
-class ShowAllProfilesView(ListView):
-    """Create a subclass of ListView to display all Profile objects.
+class ShowAllProfilesView(CurrentProfileMixin, ListView):
+    """Create a subclass of ListView to display the profile directory.
     
-    This view retrieves all Profile objects from the database and displays
-    them in a list format using the specified template.
+    Shows one page of profiles in name order, optionally filtered by
+    ?city= and ?name= (a first or last name prefix). The ?after=
+    parameter is the cursor of the last profile on the previous page.
     """
 
     # specify which model to retrieve objects from
@@ -48,15 +66,35 @@ class ShowAllProfilesView(ListView):
     def dispatch(self, request, *args, **kwargs):
         '''Override the dispatch method to add debugging information.'''
 
-        if request.user.is_authenticated:
-            print(f'ShowAllProfilesView.dispatch(): request.user={request.user}')
-        else:
-            print(f'ShowAllProfilesView.dispatch(): not logged in.')
+        # checked first so the user is not loaded just to be logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('ShowAllProfilesView.dispatch(): user=%s authenticated=%s',
+                         request.user, request.user.is_authenticated)
 
         return super().dispatch(request, *args, **kwargs)
     
+    def get_queryset(self):
+        """Return one page of the directory for the filters in the query string."""
+        page, self.next_cursor = get_directory_page(
+            city=self.request.GET.get('city'),
+            name=self.request.GET.get('name'),
+            cursor=self.request.GET.get('after'),
+        )
+        return page
+    
+    def get_context_data(self, **kwargs):
+        """Add the filters and the query string of the next page."""
+        context = super().get_context_data(**kwargs)
+        context['city'] = self.request.GET.get('city', '')
+        context['name'] = self.request.GET.get('name', '')
+        if self.next_cursor:
+            params = self.request.GET.copy()
+            params['after'] = self.next_cursor
+            context['next_query'] = params.urlencode()
+        return context
+    
 
-class ShowProfilePageView(DetailView):
+class ShowProfilePageView(CurrentProfileMixin, DetailView):
     """Show the details for one Profile object.
     
     This view displays detailed information about a single profile,
@@ -71,7 +109,7 @@ class ShowProfilePageView(DetailView):
     context_object_name = 'profiles'
 
 
-class CreateProfileView(LoginRequiredMixin, CreateView):
+class CreateProfileView(LoginRequiredMixin, CurrentProfileMixin, CreateView):
     """Handle creation of new Profile objects.
     
     This view displays a form for creating new profiles and processes
@@ -89,11 +127,11 @@ class CreateProfileView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         
-        print(f'CreateProfileView: form.cleaned_data={form.cleaned_data}')
+        logger.debug('CreateProfileView: form.cleaned_data=%s', form.cleaned_data)
         
         # find the logged in user
         user = self.request.user
-        print(f"CreateProfileView user={user} profile.user={user}")
+        logger.debug('CreateProfileView: user=%s', user)
 
         # attach user to form instance (Article object):
         form.instance.user = user
@@ -102,7 +140,7 @@ class CreateProfileView(LoginRequiredMixin, CreateView):
     
     
 
-class CreateStatusMessageView(LoginRequiredMixin, CreateView):
+class CreateStatusMessageView(LoginRequiredMixin, CurrentProfileMixin, CreateView):
     """Handle creation of new StatusMessage objects.
     
     This view displays a form for creating status messages and processes
@@ -122,8 +160,7 @@ class CreateStatusMessageView(LoginRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         """Add the profile to the context for the template."""
         context = super().get_context_data(**kwargs)
-        profile = Profile.objects.filter(user=self.request.user).first()
-        context['profile'] = profile
+        context['profile'] = self.get_current_profile()
         return context
     
     def get_success_url(self):
@@ -132,46 +169,31 @@ class CreateStatusMessageView(LoginRequiredMixin, CreateView):
         After creating a status message, redirect back to the profile page
         that the message was posted to.
         """
-        profile = Profile.objects.filter(user=self.request.user).first()
         # generate and return the URL for the profile detail page
-        return reverse('show_profile', kwargs={'pk': profile.pk})
+        return reverse('show_profile', kwargs={'pk': self.get_current_profile().pk})
 
     def form_valid(self, form):
-        # Get the profile
-        profile = Profile.objects.filter(user=self.request.user).first()
-        form.instance.profile = profile
+        """Save the status message and its uploaded images together.
         
-        # Save the status message first
-        sm = form.save()
+        The images are written to storage and inserted in bulk by
+        save_status_images(); thumbnails are generated after the commit,
+        and the stored files are deleted again if the transaction rolls back.
+        """
+        profile = self.get_current_profile()
+        form.instance.profile = profile
         
         # Handle file uploads
         files = self.request.FILES.getlist('files')
-
         
-        # Import the Image and StatusImage models
-        from .models import Image, StatusImage
-        
-        # Process each uploaded file
-        for file in files:
-            # Create an Image object for each uploaded file
-            image = Image.objects.create(
-                profile=profile,
-                image_file=file,
-                caption=''  # You can add caption functionality later
-            )
-
-            
-            # Create StatusImage to link the image with the status message
-            StatusImage.objects.create(
-                status_message=sm,
-                image=image
-            )
+        # Save the status message and link its images in one transaction
+        with atomic_upload() as stored:
+            sm = form.save()
+            save_status_images(sm, profile, files, stored)
         
         # Return to the profile page
-
         return redirect(self.get_success_url())
     
-class UpdateProfileView(LoginRequiredMixin, UpdateView):
+class UpdateProfileView(LoginRequiredMixin, CurrentProfileMixin, UpdateView):
     
     model = Profile
     form_class = UpdateProfileForm
@@ -182,10 +204,10 @@ class UpdateProfileView(LoginRequiredMixin, UpdateView):
         return reverse('login') 
     def get_object(self):
         '''Return the Profile object for the logged-in user'''
-        return Profile.objects.filter(user=self.request.user).first()
+        return self.get_current_profile()
         
     
-class DeleteStatusMessageView(LoginRequiredMixin, DeleteView):
+class DeleteStatusMessageView(LoginRequiredMixin, CurrentProfileMixin, DeleteView):
     model = StatusMessage
     template_name = "mini_fb/delete_status_form.html"
     context_object_name = 'status_message'
@@ -208,7 +230,7 @@ class DeleteStatusMessageView(LoginRequiredMixin, DeleteView):
         return reverse('show_profile', kwargs={'pk': profile.pk})
     
 
-class UpdateStatusMessageView(LoginRequiredMixin, UpdateView):
+class UpdateStatusMessageView(LoginRequiredMixin, CurrentProfileMixin, UpdateView):
     model = StatusMessage
     fields = ['message']  # Only allow updating the message text
     template_name = "mini_fb/update_status_form.html"
@@ -246,7 +268,7 @@ class AddFriendView(LoginRequiredMixin, View):
         other_pk = self.kwargs.get('other_pk')  # Profile to add as friend
         
         # Get profile for logged-in user
-        profile = Profile.objects.filter(user=request.user).first()
+        profile = get_current_profile(request)
         
         # Check if profile exists
         if not profile:
@@ -268,7 +290,7 @@ class AddFriendView(LoginRequiredMixin, View):
         # Always redirect back to the logged-in user's profile page
         return redirect('show_profile', pk=profile.pk)
 
-class ShowFriendSuggestionsView(DetailView):
+class ShowFriendSuggestionsView(CurrentProfileMixin, DetailView):
     """Display friend suggestions for a specific profile.
     
     Shows a list of profiles that the user could add as friends,
@@ -284,15 +306,16 @@ class ShowFriendSuggestionsView(DetailView):
     
     def get_object(self):
         '''Return the Profile object for the logged-in user'''
-        return Profile.objects.filter(user=self.request.user).first()
+        return self.get_current_profile()
 
         
     
-class ShowNewsFeedView(DetailView):
+class ShowNewsFeedView(CurrentProfileMixin, DetailView):
     """Display the news feed for a specific profile.
     
     Shows status messages from the profile and all their friends,
-    ordered by most recent first.
+    ordered by most recent first, one page at a time. The ?before=
+    parameter is the cursor of the last status on the previous page.
     """
     
     # Specify the model to use
@@ -304,10 +327,106 @@ class ShowNewsFeedView(DetailView):
     
     def get_object(self):
         '''Return the Profile object for the logged-in user'''
-        return Profile.objects.filter(user=self.request.user).first()
+        return self.get_current_profile()
+    
+    def get_context_data(self, **kwargs):
+        """Add one page of the feed and the cursor for the next page."""
+        context = super().get_context_data(**kwargs)
+        feed, next_cursor = get_feed_page(self.object, cursor=self.request.GET.get('before'))
+        context['feed'] = feed
+        context['next_cursor'] = next_cursor
+        return context
         
     
     
+class SearchStatusMessagesView(LoginRequiredMixin, CurrentProfileMixin, ListView):
+    """Search the status messages of the logged-in user and their friends.
+    
+    ?q= holds the words to find; results are ranked by relevance and
+    shown one page (?page=) at a time.
+    """
+    
+    template_name = 'mini_fb/search_status.html'
+    context_object_name = 'results'
+    
+    def get_login_url(self):
+        '''return the URL required for login'''
+        return reverse('login')
+    
+    def get_page_number(self):
+        """Return the requested results page, 1 if missing or invalid."""
+        try:
+            return max(int(self.request.GET.get('page', 1)), 1)
+        except ValueError:
+            return 1
+    
+    def get_queryset(self):
+        """Return the matching statuses on the requested page."""
+        profile = self.get_current_profile()
+        self.has_next = False
+        if profile is None:
+            return []
+        results, self.has_next = search_statuses(profile, self.request.GET.get('q', ''), page=self.get_page_number())
+        return results
+    
+    def get_context_data(self, **kwargs):
+        """Add the query and the neighbouring page numbers."""
+        context = super().get_context_data(**kwargs)
+        page = self.get_page_number()
+        context['query'] = self.request.GET.get('q', '')
+        context['previous_page'] = page - 1 if page > 1 else None
+        context['next_page'] = page + 1 if self.has_next else None
+        return context
+
+
+class ProfileNetworkView(View):
+    """Return a profile's friend and friend-of-friend counts as JSON."""
+    
+    def get(self, request, pk):
+        """Return the counts, or 404 if the profile does not exist."""
+        profile = get_object_or_404(Profile, pk=pk)
+        graph = get_social_graph()
+        return JsonResponse({
+            'profile': profile.pk,
+            'friends': len(graph.friends(profile.pk)),
+            'friends_of_friends': graph.friends_of_friends_count(profile.pk),
+        })
+
+
+class ProfileConnectionView(View):
+    """Return the mutual friends of two profiles and the degrees of separation between them as JSON.
+    
+    degrees is null when the profiles are not connected within
+    MAX_SEPARATION hops.
+    """
+    
+    # mutual friends listed by name; the count covers all of them
+    mutual_limit = 50
+    
+    def get(self, request, pk, other_pk):
+        """Return the connection, or 404 if either profile does not exist."""
+        profiles = Profile.objects.in_bulk([pk, other_pk])
+        if pk not in profiles or other_pk not in profiles:
+            raise Http404('No such profile')
+        
+        graph = get_social_graph()
+        mutual = graph.mutual_friends(pk, other_pk)
+        path = graph.shortest_path(pk, other_pk)
+        
+        # names for everyone returned, in one query
+        names = {
+            p.pk: f'{p.first_name} {p.last_name}'
+            for p in Profile.objects.filter(pk__in=mutual[:self.mutual_limit] + (path or [])).only('first_name', 'last_name')
+        }
+        return JsonResponse({
+            'profiles': [pk, other_pk],
+            'mutual_friend_count': len(mutual),
+            'mutual_friends': [{'id': i, 'name': names.get(i)} for i in mutual[:self.mutual_limit]],
+            'degrees': len(path) - 1 if path else None,
+            'path': [{'id': i, 'name': names.get(i)} for i in path] if path else [],
+        })
+
+
 class RegistrationView(CreateView):
     '''
     show/process form for account registration
@@ -4,6 +4,8 @@ from django.shortcuts import render
 from django.http import HttpRequest, HttpResponse
 import random
 
+from cs412.page_cache import cache_anonymous_page
+
 
 # Create your views here.
 
@@ -37,6 +39,9 @@ def quote(request):
     
     return render(request, template_name, context)
 
+# about and showall are the same for everyone, so they are served from the
+# page cache; mainpage and quote pick a random quote on every request
+@cache_anonymous_page('quotes')
 def about(request):
     template_name = "quotes/about.html"
 
@@ -44,6 +49,7 @@ def about(request):
     
     return render(request, template_name)
 
+@cache_anonymous_page('quotes')
 def showall(request):
     template_name = "quotes/showall.html"
 
@@ -0,0 +1,156 @@
+# File: benchmark_concurrency.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Drives concurrent page views, stall toggles and supply orders
+# against the configured database and reports throughput, latency and errors.
+
+import random
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from toiletapp.models import Product, Restroom, Stall, User
+
+
+class Command(BaseCommand):
+    """Run a mixed read/write request load from several threads at once.
+
+    Each thread logs in as a benchmark user (so the page cache is bypassed)
+    and sends requests through the full middleware and view stack: restroom
+    list and detail page views, stall status updates and supply orders.
+    The rows the benchmark needs are committed, because every thread uses
+    its own connection, and deleted again at the end.
+
+    Run it once per database profile to compare them, e.g.
+    DATABASE_ENGINE=postgresql python manage.py benchmark_concurrency
+
+    Usage: python manage.py benchmark_concurrency --threads 8 --requests 200
+    """
+    help = 'Benchmark concurrent reads and writes against the configured database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='requests per thread')
+        parser.add_argument('--write-share', type=float, default=0.3,
+                            help='share of requests that update a stall or place an order')
+        parser.add_argument('--restrooms', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.describe_database())
+        user, restrooms, product = self.seed(options['restrooms'])
+        try:
+            stalls = list(Stall.objects.filter(restroom__in=restrooms).values_list('pk', flat=True))
+            timings = {'read': [], 'stall': [], 'order': []}
+            errors = []
+            lock = threading.Lock()
+
+            def work(seed):
+                results, failures = self.run_client(user, restrooms, stalls, product, options['requests'],
+                                                    options['write_share'], random.Random(seed))
+                with lock:
+                    for kind, values in results.items():
+                        timings[kind].extend(values)
+                    errors.extend(failures)
+
+            threads = [threading.Thread(target=work, args=(412 + n,)) for n in range(options['threads'])]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            self.report(timings, errors, elapsed)
+        finally:
+            self.cleanup(user, restrooms, product)
+
+    def describe_database(self):
+        """Return a line naming the database engine and, for SQLite, its journal mode."""
+        if connection.vendor != 'sqlite':
+            return f'Database: {connection.vendor}'
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+        return f'Database: sqlite (journal_mode={journal_mode}, synchronous={synchronous})'
+
+    def seed(self, count):
+        """Create a benchmark user, `count` restrooms with four stalls each, and a product to order."""
+        user = User.objects.create_user(username=f'benchmark-{time.time_ns()}')
+        restrooms = Restroom.objects.bulk_create(
+            Restroom(name=f'Benchmark restroom {n}', address=f'{n} Benchmark St', created_by=user)
+            for n in range(count)
+        )
+        Stall.objects.bulk_create(
+            Stall(restroom=restroom, stall_no=number) for restroom in restrooms for number in range(1, 5)
+        )
+        product = Product.objects.create(name='Benchmark paper', description='Benchmark',
+                                         unit_price=Decimal('1.00'), stock_qty=10 ** 9,
+                                         image_url='https://example.com/paper.png')
+        return user, restrooms, product
+
+    def cleanup(self, user, restrooms, product):
+        """Delete everything seed() created, along with the orders the benchmark placed."""
+        Restroom.objects.filter(pk__in=[restroom.pk for restroom in restrooms]).delete()
+        product.delete()
+        user.delete()
+
+    def run_client(self, user, restrooms, stalls, product, requests, write_share, rng):
+        """Send `requests` requests as one logged-in visitor; returns (timings in ms by kind, errors)."""
+        client = Client()
+        client.force_login(user)
+        timings = {'read': [], 'stall': [], 'order': []}
+        errors = []
+        try:
+            for _ in range(requests):
+                roll = rng.random()
+                if roll < write_share / 2:
+                    kind = 'stall'
+                    url = reverse('toiletapp:update_stall', kwargs={'pk': rng.choice(stalls)})
+                    send = lambda: client.post(url, {'is_occupied': 'on'} if rng.random() < 0.5 else {})
+                elif roll < write_share:
+                    kind = 'order'
+                    url = reverse('toiletapp:create_order', kwargs={'pk': rng.choice(restrooms).pk})
+                    send = lambda: client.post(url, {f'product_{product.pk}': 1})
+                else:
+                    kind = 'read'
+                    if rng.random() < 0.5:
+                        url = reverse('toiletapp:show_restroom', kwargs={'pk': rng.choice(restrooms).pk})
+                    else:
+                        url = reverse('toiletapp:show_all_restrooms')
+                    send = lambda: client.get(url)
+
+                start = time.perf_counter()
+                try:
+                    response = send()
+                except DatabaseError as error:
+                    errors.append(f'{kind}: {error}')
+                    continue
+                timings[kind].append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    errors.append(f'{kind}: HTTP {response.status_code}')
+        finally:
+            client.logout()
+            connections.close_all()
+        return timings, errors
+
+    def report(self, timings, errors, elapsed):
+        """Print the throughput, per-kind latency percentiles and errors."""
+        completed = sum(len(values) for values in timings.values())
+        self.stdout.write(f'{completed} requests in {elapsed:.2f} s ({completed / elapsed:.1f} requests/s)')
+        for kind, values in timings.items():
+            if not values:
+                continue
+            values.sort()
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            self.stdout.write(f'{kind:>6}: median {statistics.median(values):8.2f} ms, '
+                              f'p95 {p95:8.2f} ms, max {values[-1]:8.2f} ms ({len(values)} requests)')
+        self.stdout.write(f'errors: {len(errors)}')
+        for error in sorted(set(errors))[:5]:
+            self.stdout.write(f'  {error}')
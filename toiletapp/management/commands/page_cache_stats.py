@@ -0,0 +1,30 @@
+# File: page_cache_stats.py
+# Author: Shuwei Zhu (david996@bu.edu)
+# Description: Reports the hit / miss counters of the anonymous page cache.
+
+from django.core.management.base import BaseCommand
+
+from cs412.page_cache import page_cache_stats, reset_page_cache_stats
+
+
+class Command(BaseCommand):
+    """Print how many cacheable page requests were served from the page cache.
+    
+    The counters live in the page cache itself, so with a shared backend
+    (file or redis) they cover every process.
+    
+    Usage: python manage.py page_cache_stats [--reset]
+    """
+    help = 'Report the hit / miss counters of the anonymous page cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Set the counters back to zero afterwards')
+
+    def handle(self, *args, **options):
+        stats = page_cache_stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  hit rate: {stats['hit_rate']:.1%}"
+        )
+        if options['reset']:
+            reset_page_cache_stats()
+            self.stdout.write('Counters reset')
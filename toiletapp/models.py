@@ -5,11 +5,15 @@
 # with enhanced functionality for the public restroom finder application.
 
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.urls import reverse
 from django.utils import timezone
 
+from cs412.page_cache import purge_page_tags_on_commit
+
 
 class User(AbstractUser):
     """Custom user model with optional avatar support and additional fields.
@@ -411,4 +415,45 @@ class Order(models.Model):
     
     class Meta:
         """Meta options for the Order model."""
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+
+def purge_restroom_pages(restroom_id):
+    """Retire the cached restroom list and the cached detail page of one restroom."""
+    purge_page_tags_on_commit('restrooms', f'restroom:{restroom_id}')
+
+
+@receiver(post_save, sender=Restroom)
+def restroom_saved(sender, instance, **kwargs):
+    """Purge the cached pages showing a new or edited restroom."""
+    purge_restroom_pages(instance.pk)
+
+
+@receiver(post_delete, sender=Restroom)
+def restroom_deleted(sender, instance, **kwargs):
+    """Purge the cached pages showing a deleted restroom."""
+    purge_restroom_pages(instance.pk)
+
+
+@receiver(post_save, sender=Stall)
+def stall_saved(sender, instance, **kwargs):
+    """Purge the cached pages showing a stall's restroom, e.g. after an occupancy change."""
+    purge_restroom_pages(instance.restroom_id)
+
+
+@receiver(post_delete, sender=Stall)
+def stall_deleted(sender, instance, **kwargs):
+    """Purge the cached pages showing a deleted stall's restroom."""
+    purge_restroom_pages(instance.restroom_id)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, **kwargs):
+    """Purge the cached pages showing the reviewed restroom."""
+    purge_restroom_pages(instance.restroom_id)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    """Purge the cached pages showing a deleted review's restroom."""
+    purge_restroom_pages(instance.restroom_id)
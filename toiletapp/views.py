@@ -26,6 +26,7 @@ from django.urls import reverse, reverse_lazy
 from django.contrib import messages
 from decimal import Decimal
 from .forms import RegisterForm
+from cs412.page_cache import cache_anonymous_page
 
 
 import json
@@ -40,11 +41,13 @@ from .forms import (
 )
 
 
+@cache_anonymous_page('restrooms')
 class ShowAllRestroomsView(ListView):
     """Create a subclass of ListView to display all Restroom objects.
     
     This view retrieves all Restroom objects from the database with
-    search and filter functionality.
+    search and filter functionality. Pages shown to anonymous visitors are
+    cached until any restroom, stall or review changes.
     """
 
     # specify which model to retrieve objects from
@@ -106,11 +109,14 @@ class ShowAllRestroomsView(ListView):
         return context
 
 
+@cache_anonymous_page('restroom:{pk}')
 class ShowRestroomDetailView(DetailView):
     """Show the details for one Restroom object.
     
     This view displays detailed information about a single restroom,
-    including reviews, stall status, and order options.
+    including reviews, stall status, and order options. The page shown to
+    anonymous visitors is cached until the restroom, its stalls or its
+    reviews change.
     """
     
     # specify which model this detail view is for
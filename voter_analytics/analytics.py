@@ -0,0 +1,242 @@
+# analytics.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Precinct-level turnout analytics computed in one vectorized NumPy pass over the voter table,
+#              participation pattern / transition analysis, and household turnout summaries
+
+from datetime import date
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+from .forms import ELECTION_FIELDS
+from .metadata import data_version
+from .models import Voter
+
+# how long (seconds) cached precinct statistics live; loads invalidate
+# them earlier through the data version in the cache key
+PRECINCT_STATS_TIMEOUT = 60 * 60
+
+# age bands reported per precinct: (label, lowest age in band)
+AGE_BANDS = [
+    ('18-29', 0),
+    ('30-44', 30),
+    ('45-64', 45),
+    ('65+', 65),
+]
+
+
+def precinct_sort_key(precinct):
+    """Sort precincts numerically where possible ('2' before '10'), then by text."""
+    digits = ''.join(ch for ch in precinct if ch.isdigit())
+    return (int(digits) if digits else float('inf'), precinct)
+
+
+def get_precinct_stats():
+    """
+    Return the per-precinct analytics, computing them once per data load.
+
+    The cache key includes the data version, so the results are reused
+    until the next load_data() or sync_data(), in any process, and then
+    recomputed on first use.
+    """
+    key = f'voter_analytics:precinct_stats:{data_version()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_precinct_stats()
+        cache.set(key, stats, PRECINCT_STATS_TIMEOUT)
+    return stats
+
+
+def compute_precinct_stats(today=None):
+    """
+    Compute turnout, voter score, party mix and age distribution for every precinct.
+
+    The needed columns are read from the Voter table in a single query and
+    converted to NumPy arrays; every statistic is then a grouped reduction
+    (np.bincount over the precinct index), so all precincts are computed in
+    one pass instead of one query per precinct.
+
+    Returns:
+        dict: 'elections', 'parties', 'age_bands' (column labels) and
+              'precincts', a list of per-precinct dicts
+    """
+    # imported here so that processes which never compute analytics do not load NumPy
+    import numpy as np
+
+    today = today or date.today()
+
+    rows = list(
+        Voter.objects.order_by()
+        .annotate(birth_year=ExtractYear('date_of_birth'))
+        .values_list('precinct_number', 'party_affiliation', 'birth_year', 'voter_score', *ELECTION_FIELDS)
+    )
+    if not rows:
+        return {
+            'elections': ELECTION_FIELDS,
+            'parties': [],
+            'age_bands': [label for label, _ in AGE_BANDS],
+            'precincts': [],
+        }
+
+    columns = list(zip(*rows))
+    precinct_codes, precinct_index = np.unique(np.array(columns[0], dtype=object).astype(str), return_inverse=True)
+    party_codes, party_index = np.unique(np.array(columns[1], dtype=object).astype(str), return_inverse=True)
+    birth_years = np.array(columns[2], dtype=np.int32)
+    scores = np.array(columns[3], dtype=np.float64)
+    votes = np.array(columns[4:], dtype=np.float64)  # shape (elections, voters)
+
+    num_precincts = len(precinct_codes)
+    num_parties = len(party_codes)
+
+    voters = np.bincount(precinct_index, minlength=num_precincts)
+    mean_score = np.bincount(precinct_index, weights=scores, minlength=num_precincts) / voters
+    turnout = np.vstack([
+        np.bincount(precinct_index, weights=votes[i], minlength=num_precincts) / voters
+        for i in range(len(ELECTION_FIELDS))
+    ])
+
+    # 2-D grouped counts: flatten (precinct, party) into a single bin index
+    party_counts = np.bincount(
+        precinct_index * num_parties + party_index,
+        minlength=num_precincts * num_parties,
+    ).reshape(num_precincts, num_parties)
+
+    ages = today.year - birth_years
+    band_index = np.digitize(ages, [low for _, low in AGE_BANDS[1:]])
+    age_counts = np.bincount(
+        precinct_index * len(AGE_BANDS) + band_index,
+        minlength=num_precincts * len(AGE_BANDS),
+    ).reshape(num_precincts, len(AGE_BANDS))
+
+    precincts = []
+    for i, precinct in enumerate(precinct_codes):
+        precincts.append({
+            'precinct': str(precinct),
+            'voters': int(voters[i]),
+            'mean_voter_score': round(float(mean_score[i]), 3),
+            'turnout': {
+                election: round(float(turnout[e, i]), 4)
+                for e, election in enumerate(ELECTION_FIELDS)
+            },
+            'party_mix': {
+                str(party): int(party_counts[i, p])
+                for p, party in enumerate(party_codes)
+                if party_counts[i, p]
+            },
+            'age_distribution': {
+                label: int(age_counts[i, b])
+                for b, (label, _) in enumerate(AGE_BANDS)
+            },
+        })
+    precincts.sort(key=lambda row: precinct_sort_key(row['precinct']))
+
+    return {
+        'elections': ELECTION_FIELDS,
+        'parties': [str(party) for party in party_codes],
+        'age_bands': [label for label, _ in AGE_BANDS],
+        'precincts': precincts,
+    }
+
+
+def household_members(household_id):
+    """Return the voters in a household, in name order (one indexed query)."""
+    return list(Voter.objects.filter(household_id=household_id).order_by('last_name', 'first_name', 'id'))
+
+
+def household_summary(members):
+    """
+    Summarize the turnout of a household.
+
+    Args:
+        members (list): The household's Voter objects
+
+    Returns:
+        dict: 'voters', 'mean_voter_score', 'turnout' (share of members who
+              voted in each election) and 'all_voted' (elections where every
+              member voted)
+    """
+    total = len(members)
+    if not total:
+        return {'voters': 0, 'mean_voter_score': 0.0, 'turnout': {}, 'all_voted': []}
+
+    voted = {election: sum(1 for voter in members if getattr(voter, election)) for election in ELECTION_FIELDS}
+    return {
+        'voters': total,
+        'mean_voter_score': round(sum(voter.voter_score for voter in members) / total, 3),
+        'turnout': {election: round(count / total, 4) for election, count in voted.items()},
+        'all_voted': [election for election, count in voted.items() if count == total],
+    }
+
+
+def pattern_label(mask):
+    """Return a participation pattern as a string of 1/0 flags in ELECTION_FIELDS order."""
+    return ''.join('1' if mask >> bit & 1 else '0' for bit in range(len(ELECTION_FIELDS)))
+
+
+def participation_histogram(queryset):
+    """
+    Count voters per participation pattern with one grouped query.
+
+    A pattern is a bit mask over ELECTION_FIELDS: bit i is set when the
+    voter voted in ELECTION_FIELDS[i].
+
+    Returns:
+        list: 2 ** len(ELECTION_FIELDS) counts, indexed by pattern mask
+    """
+    histogram = [0] * (1 << len(ELECTION_FIELDS))
+    for row in queryset.order_by().values(*ELECTION_FIELDS).annotate(count=Count('id')):
+        mask = sum(1 << bit for bit, election in enumerate(ELECTION_FIELDS) if row[election])
+        histogram[mask] += row['count']
+    return histogram
+
+
+def compute_turnout_transitions(queryset):
+    """
+    Compute the participation pattern histogram and pairwise transition matrices.
+
+    Everything is derived from the 32-entry pattern histogram with vectorized
+    bit operations, so the database is queried once regardless of the
+    number of election pairs.
+
+    Returns:
+        dict: 'elections', 'total', 'patterns' (non-empty patterns, largest
+              first) and 'transitions', one entry per pair of elections
+              (earlier, later) holding the 2x2 matrix of voter counts
+              [[skipped both, voted later only], [voted earlier only, voted both]]
+    """
+    import numpy as np
+
+    histogram = participation_histogram(queryset)
+    counts = np.array(histogram, dtype=np.int64)
+    masks = np.arange(len(histogram))
+    voted = [(masks >> bit) & 1 for bit in range(len(ELECTION_FIELDS))]
+
+    transitions = []
+    for i, earlier in enumerate(ELECTION_FIELDS):
+        for j in range(i + 1, len(ELECTION_FIELDS)):
+            matrix = np.bincount(voted[i] * 2 + voted[j], weights=counts, minlength=4).reshape(2, 2)
+            transitions.append({
+                'from': earlier,
+                'to': ELECTION_FIELDS[j],
+                'matrix': matrix.astype(np.int64).tolist(),
+            })
+
+    order = np.argsort(-counts, kind='stable')
+    patterns = [
+        {
+            'mask': int(mask),
+            'pattern': pattern_label(mask),
+            'elections': [election for bit, election in enumerate(ELECTION_FIELDS) if mask >> bit & 1],
+            'count': int(counts[mask]),
+        }
+        for mask in order if counts[mask]
+    ]
+
+    return {
+        'elections': ELECTION_FIELDS,
+        'total': int(counts.sum()),
+        'patterns': patterns,
+        'transitions': transitions,
+    }
@@ -0,0 +1,146 @@
+# export.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Streaming encoders (CSV, columnar binary, gzip) for exporting filtered voter sets
+
+import csv
+import io
+import json
+import struct
+import zlib
+from array import array
+from datetime import date
+from itertools import islice
+
+# columns written by the export, in order, with their columnar type
+EXPORT_COLUMNS = [
+    ('id', 'int'),
+    ('last_name', 'str'),
+    ('first_name', 'str'),
+    ('street_number', 'str'),
+    ('street_name', 'str'),
+    ('apartment_number', 'str'),
+    ('zip_code', 'str'),
+    ('date_of_birth', 'date'),
+    ('date_of_registration', 'date'),
+    ('party_affiliation', 'str'),
+    ('precinct_number', 'str'),
+    ('v20state', 'bool'),
+    ('v21town', 'bool'),
+    ('v21primary', 'bool'),
+    ('v22general', 'bool'),
+    ('v23town', 'bool'),
+    ('voter_score', 'uint8'),
+]
+EXPORT_FIELDS = [name for name, _ in EXPORT_COLUMNS]
+
+# rows fetched from the database cursor, and encoded, per chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# magic bytes at the start of a columnar export
+COLUMNAR_MAGIC = b'VCOL1\n'
+
+# days from 0001-01-01 to 1970-01-01, to store dates as days since the Unix epoch
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of up to chunk_size export tuples from the queryset.
+
+    Uses QuerySet.iterator() so rows are streamed from a (server-side, where
+    supported) cursor and memory use does not grow with the export size.
+    """
+    rows = queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def csv_stream(chunks):
+    """Encode chunks of rows as UTF-8 CSV, yielding one bytes block per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(EXPORT_FIELDS)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    # header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def columnar_stream(chunks):
+    """
+    Encode chunks of rows in a compact column-oriented binary format.
+
+    Layout (all integers little-endian):
+      - COLUMNAR_MAGIC, then a JSON line describing the columns:
+        {"columns": [[name, type], ...]}
+      - one block per chunk: uint32 row count, then each column in order:
+          int   -> row count x int64
+          uint8 -> row count x uint8
+          bool  -> row count x uint8 (0/1)
+          date  -> row count x int32 days since 1970-01-01
+          str   -> (row count + 1) x uint32 byte offsets, then the UTF-8 bytes
+      - a final uint32 0 marks the end of the stream
+
+    Every block is self-contained, so a reader can process the file one
+    block at a time.
+    """
+    header = json.dumps({'columns': EXPORT_COLUMNS}, separators=(',', ':'))
+    yield COLUMNAR_MAGIC + header.encode('utf-8') + b'\n'
+
+    for chunk in chunks:
+        parts = [struct.pack('<I', len(chunk))]
+        for index, (_, kind) in enumerate(EXPORT_COLUMNS):
+            values = [row[index] for row in chunk]
+            parts.append(encode_column(kind, values))
+        yield b''.join(parts)
+
+    yield struct.pack('<I', 0)
+
+
+def encode_column(kind, values):
+    """Encode one column of a block; see columnar_stream() for the layout."""
+    if kind == 'int':
+        column = array('q', values)
+    elif kind == 'uint8':
+        column = array('B', values)
+    elif kind == 'bool':
+        column = array('B', (1 if value else 0 for value in values))
+    elif kind == 'date':
+        column = array('i', (value.toordinal() - EPOCH_ORDINAL for value in values))
+    else:
+        encoded = [(value or '').encode('utf-8') for value in values]
+        offsets = array('I', [0])
+        total = 0
+        for item in encoded:
+            total += len(item)
+            offsets.append(total)
+        return _little_endian(offsets) + b''.join(encoded)
+    return _little_endian(column)
+
+
+def _little_endian(column):
+    """Return the bytes of an array in little-endian order."""
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        column.byteswap()
+    return column.tobytes()
+
+
+def gzip_stream(stream, level=6):
+    """Compress a stream of bytes blocks on the fly, yielding gzip-framed output."""
+    # wbits=31 selects the gzip container (16) with a 32K window (15)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for block in stream:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
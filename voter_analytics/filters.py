@@ -0,0 +1,210 @@
+# filters.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Single voter filter object shared by the list, graph and export views
+
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractYear
+
+from .analytics import compute_turnout_transitions
+from .forms import ELECTION_FIELDS, VoterFilterForm
+from .metadata import data_version
+from .models import Voter
+
+# how long (seconds) cached results live; loads invalidate them earlier
+# through the data version in the cache key
+RESULT_CACHE_TIMEOUT = 60 * 60
+
+
+class VoterFilter:
+    """
+    The set of filters selected on the voter filter form.
+
+    Parsed and validated once from the GET parameters, then used to build
+    the filtered queryset. Two requests selecting the same filters produce
+    equal VoterFilter objects with the same `key`, which is what cached
+    results (counts, graph aggregates) are stored under.
+    """
+
+    def __init__(self, party_affiliation='', min_dob_year=None, max_dob_year=None,
+                 voter_score=None, elections=()):
+        self.party_affiliation = party_affiliation or ''
+        self.min_dob_year = min_dob_year
+        self.max_dob_year = max_dob_year
+        self.voter_score = voter_score
+        # keep elections in model order so the key does not depend on parameter order
+        self.elections = tuple(name for name in ELECTION_FIELDS if name in elections)
+
+    @classmethod
+    def from_query_params(cls, params):
+        """
+        Build a filter from a QueryDict such as request.GET.
+
+        Args:
+            params (QueryDict): GET parameters submitted by the filter form
+
+        Returns:
+            VoterFilter: The validated filter; invalid parameters are ignored
+        """
+        data = VoterFilterForm(params).valid_data()
+        return cls(
+            party_affiliation=data.get('party_affiliation'),
+            min_dob_year=data.get('min_dob_year'),
+            max_dob_year=data.get('max_dob_year'),
+            voter_score=data.get('voter_score'),
+            elections=[name for name in ELECTION_FIELDS if data.get(name)],
+        )
+
+    @property
+    def key(self):
+        """Normalized, hashable representation of the selected filters."""
+        return (
+            self.party_affiliation,
+            self.min_dob_year,
+            self.max_dob_year,
+            self.voter_score,
+            self.elections,
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, VoterFilter) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f'VoterFilter{self.key!r}'
+
+    def apply(self, queryset):
+        """
+        Apply the filters to a Voter queryset.
+
+        Filters are applied cumulatively - if multiple filters are selected,
+        voters must match ALL criteria (AND logic).
+        """
+        if self.party_affiliation:
+            queryset = queryset.filter(party_affiliation=self.party_affiliation)
+
+        if self.min_dob_year is not None:
+            queryset = queryset.filter(date_of_birth__year__gte=self.min_dob_year)
+
+        if self.max_dob_year is not None:
+            queryset = queryset.filter(date_of_birth__year__lte=self.max_dob_year)
+
+        if self.voter_score is not None:
+            queryset = queryset.filter(voter_score=self.voter_score)
+
+        for election in self.elections:
+            queryset = queryset.filter(**{election: True})
+
+        return queryset
+
+    def queryset(self):
+        """Return the filtered Voter queryset."""
+        return self.apply(Voter.objects.all())
+
+    def query_string(self):
+        """Return the filters as a normalized URL query string (without '?')."""
+        params = []
+        if self.party_affiliation:
+            params.append(('party_affiliation', self.party_affiliation))
+        if self.min_dob_year is not None:
+            params.append(('min_dob_year', self.min_dob_year))
+        if self.max_dob_year is not None:
+            params.append(('max_dob_year', self.max_dob_year))
+        if self.voter_score is not None:
+            params.append(('voter_score', self.voter_score))
+        for election in self.elections:
+            params.append((election, 'on'))
+        return urlencode(params)
+
+    def cache_key(self, name):
+        """
+        Return the cache key for a result named `name` computed with these filters.
+
+        The key includes the current data version, so results cached before
+        the last load_data() are never returned.
+        """
+        digest = hashlib.sha1(repr(self.key).encode('utf-8')).hexdigest()
+        return f'voter_analytics:{name}:{data_version()}:{digest}'
+
+    def cached(self, name, compute):
+        """Return the cached result `name`, calling compute() to fill it on a miss."""
+        key = self.cache_key(name)
+        result = cache.get(key)
+        if result is None:
+            result = compute()
+            cache.set(key, result, RESULT_CACHE_TIMEOUT)
+        return result
+
+    def count(self):
+        """Return the number of matching voters (cached)."""
+        return self.cached('count', lambda: self.queryset().count())
+
+    def graph_data(self):
+        """
+        Return the aggregates behind the graphs page (cached).
+
+        Returns:
+            dict: 'total', 'birth_years' (list of (year, count)),
+                  'parties' (list of (party, count), largest first) and
+                  'elections' (list of (election, count))
+        """
+        return self.cached('graph_data', self._compute_graph_data)
+
+    def _compute_graph_data(self):
+        """Run the three grouped queries behind graph_data()."""
+        voters = self.queryset()
+
+        birth_years = [
+            (row['year'], row['count'])
+            for row in voters.annotate(year=ExtractYear('date_of_birth'))
+                             .values('year').annotate(count=Count('id')).order_by('year')
+        ]
+
+        parties = [
+            (row['party_affiliation'], row['count'])
+            for row in voters.values('party_affiliation').annotate(count=Count('id')).order_by('-count')
+        ]
+
+        totals = voters.aggregate(
+            total=Count('id'),
+            **{election: Count('id', filter=Q(**{election: True})) for election in ELECTION_FIELDS}
+        )
+
+        return {
+            'total': totals['total'],
+            'birth_years': birth_years,
+            'parties': parties,
+            'elections': [(election, totals[election]) for election in ELECTION_FIELDS],
+        }
+
+    def turnout_transitions(self):
+        """
+        Return the participation patterns and election-to-election transitions (cached).
+
+        See analytics.compute_turnout_transitions() for the format.
+        """
+        return self.cached('turnout_transitions', lambda: compute_turnout_transitions(self.queryset()))
+
+    def selected_context(self):
+        """
+        Return the template variables that preserve the selections in the filter form.
+
+        Returns:
+            dict: selected_* values as strings and <election>_checked flags
+        """
+        context = {
+            'selected_party': self.party_affiliation,
+            'selected_min_year': '' if self.min_dob_year is None else str(self.min_dob_year),
+            'selected_max_year': '' if self.max_dob_year is None else str(self.max_dob_year),
+            'selected_voter_score': '' if self.voter_score is None else str(self.voter_score),
+            'filter_query': self.query_string(),
+        }
+        for election in ELECTION_FIELDS:
+            context[f'{election}_checked'] = election in self.elections
+        return context
@@ -1,15 +1,26 @@
+# forms.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Form used to validate the voter filter GET parameters shared by the list, graph and export views
+
 from django import forms
-from .models import Voter, PARTY_CHOICES
-from django.db.models import Q
 
-YEARS = [("", "Any")] + [(y, y) for y in range(1920, 2007)]  # adjust as needed
-SCORES = [("", "Any")] + [(i, i) for i in range(6)]
+# the five elections tracked on the Voter model, in chronological order
+ELECTION_FIELDS = ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']
+
 
 class VoterFilterForm(forms.Form):
-    party          = forms.ChoiceField(choices=[("", "Any")] + PARTY_CHOICES, required=False)
-    dob_min        = forms.ChoiceField(choices=YEARS, required=False, label="Born after")
-    dob_max        = forms.ChoiceField(choices=YEARS, required=False, label="Born before")
-    voter_score    = forms.ChoiceField(choices=SCORES, required=False)
+    """
+    Validate the filter parameters submitted by the voter filter form.
+
+    Field names match the GET parameters used by the templates, so the form
+    can be bound directly to request.GET. Invalid values (e.g. a non-numeric
+    year) are dropped instead of raising an error.
+    """
+    party_affiliation = forms.CharField(required=False, max_length=2, strip=False)
+    min_dob_year      = forms.IntegerField(required=False, min_value=1800, max_value=2100)
+    max_dob_year      = forms.IntegerField(required=False, min_value=1800, max_value=2100)
+    voter_score       = forms.IntegerField(required=False, min_value=0, max_value=5)
 
     v20state   = forms.BooleanField(required=False, label="2020 State")
     v21town    = forms.BooleanField(required=False, label="2021 Town")
@@ -17,23 +28,16 @@ class VoterFilterForm(forms.Form):
     v22general = forms.BooleanField(required=False, label="2022 General")
     v23town    = forms.BooleanField(required=False, label="2023 Town")
 
-    def apply_filters(self, qs):
-        cd = self.cleaned_data
-
-        if cd["party"]:
-            qs = qs.filter(party__exact=cd["party"])
-
-        if cd["dob_min"]:
-            qs = qs.filter(dob__year__gte=int(cd["dob_min"]))
-        if cd["dob_max"]:
-            qs = qs.filter(dob__year__lte=int(cd["dob_max"]))
-
-        if cd["voter_score"]:
-            qs = qs.filter(voter_score=int(cd["voter_score"]))
-
-        # turnout checkboxes
-        for field in ["v20state","v21town","v21primary","v22general","v23town"]:
-            if cd[field]:
-                qs = qs.filter(**{field: True})
-
-        return qs
+    def valid_data(self):
+        """
+        Return the cleaned values of every field that validated.
+
+        Fields with errors are left out, so one bad parameter does not
+        discard the rest of the filters.
+        """
+        self.is_valid()
+        return {
+            name: self.cleaned_data[name]
+            for name in self.fields
+            if name in self.cleaned_data
+        }
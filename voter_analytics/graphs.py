@@ -0,0 +1,293 @@
+# graphs.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Builds the Plotly figures for the graphs page as compact JSON, cached per filter
+
+import json
+import threading
+from collections import OrderedDict
+
+# number of serialized figure sets kept in memory per process
+FIGURE_CACHE_SIZE = 128
+
+
+class LRUCache:
+    """
+    Small thread-safe least-recently-used cache.
+
+    Holds at most `maxsize` entries; adding one more evicts the entry that
+    was read or written longest ago.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value stored under key (marking it recently used), or None."""
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+figure_cache = LRUCache(FIGURE_CACHE_SIZE)
+
+
+def get_figures_json(voter_filter):
+    """
+    Return the graphs for a filter as a JSON string, building them on a cache miss.
+
+    The cache key comes from VoterFilter.cache_key(), which includes the data
+    version, so figures built before the last load are never served.
+
+    Args:
+        voter_filter (VoterFilter): Filters selected on the graphs page
+
+    Returns:
+        str: JSON object mapping graph name to a {data, layout} figure
+    """
+    key = voter_filter.cache_key('figures')
+    figures_json = figure_cache.get(key)
+    if figures_json is None:
+        figures_json = build_figures_json(voter_filter.graph_data(), voter_filter.turnout_transitions())
+        figure_cache.set(key, figures_json)
+    return figures_json
+
+
+def build_figures_json(data, transitions):
+    """
+    Build the graphs from the filter aggregates and serialize them.
+
+    Plotly is imported inside these functions rather than at module level
+    so that processes which never draw a graph do not pay for importing it.
+
+    Args:
+        data (dict): Aggregates from VoterFilter.graph_data()
+        transitions (dict): Patterns and transitions from VoterFilter.turnout_transitions()
+
+    Returns:
+        str: JSON object with 'birth_year', 'party', 'election', 'pattern'
+             and 'transition' figures
+    """
+    from plotly.utils import PlotlyJSONEncoder
+
+    figures = {
+        'birth_year': create_birth_year_histogram(data),
+        'party': create_party_pie_chart(data),
+        'election': create_election_histogram(data),
+        'pattern': create_pattern_histogram(transitions),
+        'transition': create_transition_heatmap(transitions),
+    }
+
+    compact = {}
+    for name, fig in figures.items():
+        figure = fig.to_plotly_json()
+        # the default template is several KB per figure; plotly.js applies its own defaults
+        figure['layout'].pop('template', None)
+        compact[name] = {'data': figure['data'], 'layout': figure['layout']}
+
+    return json.dumps(compact, cls=PlotlyJSONEncoder, separators=(',', ':'))
+
+
+def create_birth_year_histogram(data):
+    """
+    Create histogram of voter distribution by birth year.
+
+    Args:
+        data (dict): Aggregates from VoterFilter.graph_data()
+
+    Returns:
+        Figure: The Plotly bar chart
+    """
+    import plotly.graph_objs as go
+
+    # Birth year counts are already sorted by year
+    fig = go.Figure(data=[
+        go.Bar(
+            x=[year for year, count in data['birth_years']],
+            y=[count for year, count in data['birth_years']],
+            marker_color='rgb(55, 83, 251)'
+        )
+    ])
+
+    fig.update_layout(
+        title=f'Voter distribution by Year of Birth (n={data["total"]})',
+        xaxis_title='Year of Birth',
+        yaxis_title='Number of Voters',
+        showlegend=False,
+        height=500
+    )
+    return fig
+
+
+def create_party_pie_chart(data):
+    """
+    Create pie chart of voter distribution by party affiliation.
+
+    Shows the percentage breakdown of voters by party, useful for
+    understanding the political composition of the filtered voter set.
+
+    Args:
+        data (dict): Aggregates from VoterFilter.graph_data()
+
+    Returns:
+        Figure: The Plotly pie chart
+    """
+    import plotly.graph_objs as go
+
+    # Party counts are already ordered largest first
+    fig = go.Figure(data=[
+        go.Pie(
+            labels=[party for party, count in data['parties']],
+            values=[count for party, count in data['parties']],
+            textinfo='label+percent',
+            textposition='auto'
+        )
+    ])
+
+    fig.update_layout(
+        title=f'Voter distribution by Party Affiliation (n={data["total"]})',
+        height=500
+    )
+    return fig
+
+
+def create_election_histogram(data):
+    """
+    Create histogram of voter participation by election.
+
+    Shows how many voters participated in each of the 5 elections,
+    helping identify which elections had higher turnout among the
+    filtered voter group.
+
+    Args:
+        data (dict): Aggregates from VoterFilter.graph_data()
+
+    Returns:
+        Figure: The Plotly bar chart
+    """
+    import plotly.graph_objs as go
+
+    fig = go.Figure(data=[
+        go.Bar(
+            x=[election for election, count in data['elections']],
+            y=[count for election, count in data['elections']],
+            marker_color='rgb(55, 83, 251)'
+        )
+    ])
+
+    fig.update_layout(
+        title=f'Vote Count by Election (n={data["total"]})',
+        xaxis_title='Election',
+        yaxis_title='Number of Voters',
+        showlegend=False,
+        height=500
+    )
+    return fig
+
+
+def create_pattern_histogram(transitions):
+    """
+    Create bar chart of voters by participation pattern.
+
+    Each bar is one combination of elections voted in, written as 1/0
+    flags in election order (e.g. 01010 voted only in v21town and v22general).
+
+    Args:
+        transitions (dict): Patterns from VoterFilter.turnout_transitions()
+
+    Returns:
+        Figure: The Plotly bar chart
+    """
+    import plotly.graph_objs as go
+
+    # Patterns are already ordered largest first
+    patterns = transitions['patterns']
+    fig = go.Figure(data=[
+        go.Bar(
+            x=[pattern['pattern'] for pattern in patterns],
+            y=[pattern['count'] for pattern in patterns],
+            hovertext=[', '.join(pattern['elections']) or 'none' for pattern in patterns],
+            marker_color='rgb(55, 83, 251)'
+        )
+    ])
+
+    fig.update_layout(
+        title=f'Voters by Participation Pattern ({", ".join(transitions["elections"])})',
+        xaxis_title='Pattern',
+        xaxis_type='category',
+        yaxis_title='Number of Voters',
+        showlegend=False,
+        height=500
+    )
+    return fig
+
+
+def create_transition_heatmap(transitions):
+    """
+    Create heatmap of turnout retention between pairs of elections.
+
+    Cell (earlier, later) is the share of voters who voted in the earlier
+    election that also voted in the later one; the hover text gives the
+    number who voted earlier but skipped the later election.
+
+    Args:
+        transitions (dict): Transitions from VoterFilter.turnout_transitions()
+
+    Returns:
+        Figure: The Plotly heatmap
+    """
+    import plotly.graph_objs as go
+
+    elections = transitions['elections']
+    index = {election: i for i, election in enumerate(elections)}
+    retention = [[None] * len(elections) for _ in elections]
+    hover = [[''] * len(elections) for _ in elections]
+
+    for pair in transitions['transitions']:
+        (_, _), (dropped, kept) = pair['matrix']
+        row, column = index[pair['from']], index[pair['to']]
+        if dropped + kept:
+            retention[row][column] = round(kept / (dropped + kept), 3)
+        hover[row][column] = f'voted in both: {kept}<br>voted {pair["from"]}, skipped {pair["to"]}: {dropped}'
+
+    fig = go.Figure(data=[
+        go.Heatmap(
+            z=retention,
+            x=elections,
+            y=elections,
+            text=hover,
+            hovertemplate='%{y} -> %{x}: %{z:.1%}<br>%{text}<extra></extra>',
+            zmin=0,
+            zmax=1,
+            colorscale='Blues'
+        )
+    ])
+
+    fig.update_layout(
+        title=f'Turnout Retention Between Elections (n={transitions["total"]})',
+        xaxis_title='Later Election',
+        yaxis_title='Earlier Election',
+        yaxis_autorange='reversed',
+        height=500
+    )
+    return fig
@@ -0,0 +1,93 @@
+# benchmark_voter_pagination.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Compares offset and keyset pagination latency for the voter list on a synthetic table
+
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from voter_analytics.models import Voter
+from voter_analytics.pagination import KeysetPaginator, encode_cursor
+
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
+              'Davis', 'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Wilson']
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael',
+               'Linda', 'David', 'Elizabeth', 'William', 'Barbara', 'Richard']
+
+
+class Command(BaseCommand):
+    """
+    Time page 1 and a late page of the voter list with OFFSET and keyset pagination.
+
+    Synthetic voters are inserted inside a transaction that is rolled back at
+    the end, so the real voter table is left untouched.
+
+    Usage: python manage.py benchmark_voter_pagination --rows 1000000 --page 5000
+    """
+    help = 'Benchmark offset vs keyset pagination of the voter list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--page', type=int, default=5000)
+        parser.add_argument('--per-page', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, page, per_page = options['rows'], options['page'], options['per_page']
+
+        with transaction.atomic():
+            self.stdout.write(f'Inserting {rows} synthetic voters...')
+            self.seed(rows)
+
+            queryset = Voter.objects.all()
+            ordering = ('last_name', 'first_name', 'id')
+            offset = (page - 1) * per_page
+
+            # cursor of the last row before the target page (not part of the timing)
+            last_before = queryset.order_by(*ordering).values_list(*ordering)[offset - 1]
+            cursor = encode_cursor(last_before)
+            paginator = KeysetPaginator(queryset, per_page, ordering=ordering)
+
+            results = [
+                ('offset', 1, lambda: list(queryset.order_by(*ordering)[:per_page])),
+                ('offset', page, lambda: list(queryset.order_by(*ordering)[offset:offset + per_page])),
+                ('keyset', 1, lambda: paginator.page().object_list),
+                ('keyset', page, lambda: paginator.page(after=cursor).object_list),
+            ]
+
+            for mode, number, fetch in results:
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    fetch()
+                    timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f'{mode:>6} page {number:>6}: median {statistics.median(timings):8.2f} ms')
+
+            transaction.set_rollback(True)
+
+    def seed(self, rows, batch_size=5000):
+        """Bulk insert `rows` random voters."""
+        rng = random.Random(412)
+        batch = []
+        for i in range(rows):
+            batch.append(Voter(
+                last_name=rng.choice(LAST_NAMES),
+                first_name=rng.choice(FIRST_NAMES),
+                street_number=str(rng.randint(1, 999)),
+                street_name='Main St',
+                zip_code='02458',
+                date_of_birth=date(rng.randint(1930, 2005), 1, 1),
+                date_of_registration=date(2020, 1, 1),
+                party_affiliation='U ',
+                precinct_number=str(rng.randint(1, 9)),
+            ))
+            if len(batch) >= batch_size:
+                Voter.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Voter.objects.bulk_create(batch)
@@ -0,0 +1,94 @@
+# benchmark_voter_search.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Measures voter name/street search latency on a synthetic table
+
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from voter_analytics.models import Voter
+from voter_analytics.search import rebuild_search_index, search_index_available, search_voters
+
+SYLLABLES = ['an', 'ber', 'ca', 'den', 'el', 'fo', 'gar', 'ha', 'in', 'jo', 'ka', 'li', 'mo',
+             'ne', 'or', 'pe', 'qui', 'ra', 'son', 'ti', 'u', 've', 'wil', 'xi', 'yo', 'zu']
+
+# exact, prefix, misspelled and multi-word queries
+DEFAULT_QUERIES = ['Garson', 'gar', 'Garosn', 'kali ti', 'Wilberca', 'anjo main', 'xx']
+
+
+class Command(BaseCommand):
+    """
+    Time search_voters() for a set of queries against a synthetic voter table.
+
+    Synthetic voters are inserted, and the search index rebuilt, inside a
+    transaction that is rolled back at the end, so the real voter table and
+    index are left untouched.
+
+    Usage: python manage.py benchmark_voter_search --rows 1000000 --query smith --query smiht
+    """
+    help = 'Benchmark fuzzy voter name/street search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--query', action='append', dest='queries')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        queries = options['queries'] or DEFAULT_QUERIES
+
+        with transaction.atomic():
+            self.stdout.write(f'Inserting {rows} synthetic voters...')
+            self.seed(rows)
+
+            start = time.perf_counter()
+            rebuild_search_index()
+            self.stdout.write(f'Index rebuilt in {time.perf_counter() - start:.1f} s')
+            if not search_index_available():
+                self.stdout.write('No FTS5 index on this database; timing the substring fallback')
+
+            for query in queries:
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    results = search_voters(query)
+                    timings.append((time.perf_counter() - start) * 1000)
+                best = results[0][0] if results else '-'
+                self.stdout.write(
+                    f'{query!r:>14}: median {statistics.median(timings):7.2f} ms, '
+                    f'{len(results):>2} results, best: {best}'
+                )
+
+            transaction.set_rollback(True)
+
+    def seed(self, rows, batch_size=5000):
+        """Bulk insert `rows` voters with random syllable names and streets."""
+        rng = random.Random(412)
+
+        def word(syllables):
+            return ''.join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+        streets = [f'{word(2)} St' for _ in range(2000)] + ['Main St']
+        batch = []
+        for i in range(rows):
+            batch.append(Voter(
+                last_name=word(3),
+                first_name=word(2),
+                street_number=str(rng.randint(1, 999)),
+                street_name=rng.choice(streets),
+                zip_code='02458',
+                date_of_birth=date(rng.randint(1930, 2005), 1, 1),
+                date_of_registration=date(2020, 1, 1),
+                party_affiliation='U ',
+                precinct_number=str(rng.randint(1, 9)),
+            ))
+            if len(batch) >= batch_size:
+                Voter.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Voter.objects.bulk_create(batch)
@@ -0,0 +1,131 @@
+# metadata.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Cached dropdown metadata (parties, birth years, voter scores) for the voter filter forms
+
+import time
+
+from django.core.cache import cache
+from django.db.models import Max, Min
+
+from .models import Voter, VoterDataVersion
+
+# cache key holding the metadata dict; stored without expiry, replaced by
+# the loader after every load and recomputed by any process that sees a
+# newer data version than the one it was computed for
+FILTER_METADATA_CACHE_KEY = 'voter_analytics:filter_metadata'
+
+# seconds a process trusts the data version it last read from the database;
+# a load made by another process is noticed at most this long afterwards
+DATA_VERSION_CHECK_INTERVAL = 5
+
+# (version, time.monotonic() when it was read) for this process
+_checked_version = None
+
+
+def compute_filter_metadata(version):
+    """
+    Query the Voter table for the values used to populate the filter dropdowns.
+
+    Runs one DISTINCT query for the parties and one aggregate query for the
+    birth date and voter score ranges.
+
+    Returns:
+        dict: 'parties' (sorted list), 'min_birth_year', 'max_birth_year',
+              'min_voter_score', 'max_voter_score' and the data 'version'
+              they were computed from
+    """
+    parties = list(
+        Voter.objects.order_by('party_affiliation')
+        .values_list('party_affiliation', flat=True)
+        .distinct()
+    )
+    ranges = Voter.objects.aggregate(
+        min_dob=Min('date_of_birth'),
+        max_dob=Max('date_of_birth'),
+        min_score=Min('voter_score'),
+        max_score=Max('voter_score'),
+    )
+
+    return {
+        'parties': parties,
+        'min_birth_year': ranges['min_dob'].year if ranges['min_dob'] else None,
+        'max_birth_year': ranges['max_dob'].year if ranges['max_dob'] else None,
+        'min_voter_score': ranges['min_score'] if ranges['min_score'] is not None else 0,
+        'max_voter_score': ranges['max_score'] if ranges['max_score'] is not None else 5,
+        'version': version,
+    }
+
+
+def read_data_version():
+    """Read the current data version from the database and remember it for this process."""
+    global _checked_version
+    version = VoterDataVersion.objects.values_list('version', flat=True).first() or ''
+    _checked_version = (version, time.monotonic())
+    return version
+
+
+def refresh_filter_metadata():
+    """Recompute the filter metadata and store it in the cache. Called by the loader."""
+    # read the version first, so a load committed while computing is
+    # noticed as a newer version on the next check
+    metadata = compute_filter_metadata(read_data_version())
+    cache.set(FILTER_METADATA_CACHE_KEY, metadata, timeout=None)
+    return metadata
+
+
+def invalidate_filter_metadata():
+    """Drop the cached metadata so the next page view recomputes it."""
+    cache.delete(FILTER_METADATA_CACHE_KEY)
+
+
+def get_filter_metadata():
+    """
+    Return the cached filter metadata, computing it only when it is missing
+    or was computed for an older data version.
+
+    Page views call this instead of querying the Voter table; apart from
+    re-reading the data version every DATA_VERSION_CHECK_INTERVAL seconds,
+    no metadata queries are issued.
+    """
+    metadata = cache.get(FILTER_METADATA_CACHE_KEY)
+    if metadata is None or metadata['version'] != data_version():
+        metadata = refresh_filter_metadata()
+    return metadata
+
+
+def data_version():
+    """
+    Return a token that changes every time the voter data is reloaded.
+
+    The token is stored in the database by the loader, so loads run in any
+    process (e.g. a management command) are seen by every web worker within
+    DATA_VERSION_CHECK_INTERVAL seconds. Cached query results include it in
+    their cache keys, so a load implicitly invalidates every result computed
+    from the previous data.
+    """
+    checked = _checked_version
+    if checked is None or time.monotonic() - checked[1] > DATA_VERSION_CHECK_INTERVAL:
+        return read_data_version()
+    return checked[0]
+
+
+def filter_choices():
+    """
+    Return the dropdown options for the filter form templates.
+
+    Returns:
+        dict: 'parties', 'years' and 'voter_scores' iterables
+    """
+    metadata = get_filter_metadata()
+
+    if metadata['min_birth_year'] is None:
+        years = range(0)
+    else:
+        years = range(metadata['min_birth_year'], metadata['max_birth_year'] + 1)
+
+    return {
+        'parties': metadata['parties'],
+        'years': years,
+        'voter_scores': range(metadata['min_voter_score'], metadata['max_voter_score'] + 1),
+    }
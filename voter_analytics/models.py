@@ -3,9 +3,12 @@
 # Email: david996@bu.edu
 # Description: Django models for voter analytics application with CSV data import functionality
 
-from django.db import models
+from django.db import models, transaction
 import csv
+import hashlib
 import os
+import re
+import uuid
 from datetime import datetime
 
 class Voter(models.Model):
@@ -41,18 +44,205 @@ class Voter(models.Model):
     v22general = models.BooleanField(default=False)
     v23town = models.BooleanField(default=False)
     
-    # Calculated Field
+    # Calculated Fields
     voter_score = models.IntegerField(default=0)
+    # hash of the normalized address, shared by every voter in the same household
+    household_id = models.CharField(max_length=16, blank=True, db_index=True)
+    
+    # Load Bookkeeping
+    # stable identifier used to match CSV rows on incremental loads
+    natural_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    # SHA-1 of the loaded field values, used to skip unchanged rows
+    row_hash = models.CharField(max_length=40, blank=True)
     
     def __str__(self):
         """String representation of a Voter"""
         return f"{self.first_name} {self.last_name} - {self.street_number} {self.street_name}"
     
     class Meta:
-        ordering = ['last_name', 'first_name']
+        ordering = ['last_name', 'first_name', 'id']
+        indexes = [
+            # matches the list ordering, used by keyset pagination
+            models.Index(fields=['last_name', 'first_name', 'id'], name='voter_name_keyset_idx'),
+        ]
+
+
+class VoterDataVersion(models.Model):
+    """
+    Single row identifying the current load of the voter data.
+    
+    load_data() and sync_data() give it a new version in the same transaction
+    as their writes, so every process can tell the data was reloaded, not
+    only the one that ran the load.
+    """
+    version = models.CharField(max_length=32)
+    loaded_at = models.DateTimeField(auto_now=True)
+
+
+def bump_data_version():
+    """Record that the Voter table changed by storing a new version token."""
+    VoterDataVersion.objects.update_or_create(pk=1, defaults={'version': uuid.uuid4().hex})
+
+
+# Fields populated from each CSV row, in the order used for the row hash
+VOTER_FIELDS = [
+    'last_name', 'first_name',
+    'street_number', 'street_name', 'apartment_number', 'zip_code',
+    'date_of_birth', 'date_of_registration', 'party_affiliation', 'precinct_number',
+    'v20state', 'v21town', 'v21primary', 'v22general', 'v23town',
+    'voter_score', 'household_id',
+]
+
+# Number of rows written per INSERT/UPDATE/DELETE statement
+BATCH_SIZE = 1000
+
+# Spellings of street suffixes and unit markers reduced to one form in household addresses
+ADDRESS_ABBREVIATIONS = {
+    'STREET': 'ST',
+    'AVENUE': 'AVE',
+    'AV': 'AVE',
+    'ROAD': 'RD',
+    'DRIVE': 'DR',
+    'LANE': 'LN',
+    'PLACE': 'PL',
+    'COURT': 'CT',
+    'TERRACE': 'TER',
+    'CIRCLE': 'CIR',
+    'PARKWAY': 'PKWY',
+    'BOULEVARD': 'BLVD',
+    'HIGHWAY': 'HWY',
+    'SQUARE': 'SQ',
+}
+UNIT_PREFIXES = {'APT', 'APARTMENT', 'UNIT', 'NO', 'STE', 'SUITE'}
+
+
+def parse_voter_row(row):
+    """
+    Convert one row of the voter CSV into a dict of Voter field values.
+    
+    Args:
+        row (dict): A row produced by csv.DictReader
+        
+    Returns:
+        dict: Field values keyed by Voter field name (see VOTER_FIELDS)
+    """
+    # Parse dates
+    dob = datetime.strptime(row['Date of Birth'], '%Y-%m-%d').date()
+    dor = datetime.strptime(row['Date of Registration'], '%Y-%m-%d').date()
+    
+    # Convert voting history to boolean
+    v20state = row['v20state'].strip().upper() == 'TRUE'
+    v21town = row['v21town'].strip().upper() == 'TRUE'
+    v21primary = row['v21primary'].strip().upper() == 'TRUE'
+    v22general = row['v22general'].strip().upper() == 'TRUE'
+    v23town = row['v23town'].strip().upper() == 'TRUE'
+    
+    # Calculate voter score
+    voter_score = sum([v20state, v21town, v21primary, v22general, v23town])
+    
+    street_number = row['Residential Address - Street Number'].strip()
+    street_name = row['Residential Address - Street Name'].strip()
+    apartment_number = (row.get('Residential Address - Apartment Number') or '').strip()
+    zip_code = row['Residential Address - Zip Code'].strip()
+    
+    return {
+        'last_name': row['Last Name'].strip(),
+        'first_name': row['First Name'].strip(),
+        'street_number': street_number,
+        'street_name': street_name,
+        'apartment_number': apartment_number,
+        'zip_code': zip_code,
+        'date_of_birth': dob,
+        'date_of_registration': dor,
+        'party_affiliation': row['Party Affiliation'],  # Keep the 2-char field as is
+        'precinct_number': row['Precinct Number'].strip(),
+        'v20state': v20state,
+        'v21town': v21town,
+        'v21primary': v21primary,
+        'v22general': v22general,
+        'v23town': v23town,
+        'voter_score': voter_score,
+        'household_id': household_id(street_number, street_name, apartment_number, zip_code),
+    }
+
+
+def normalize_address_part(value, drop=()):
+    """Uppercase an address part, drop punctuation and standardize abbreviations."""
+    words = re.sub(r'[^0-9A-Z]+', ' ', (value or '').upper()).split()
+    return ' '.join(ADDRESS_ABBREVIATIONS.get(word, word) for word in words if word not in drop)
+
+
+def household_id(street_number, street_name, apartment_number, zip_code):
+    """
+    Return the household key for an address.
+    
+    The address is normalized first ('12 Walnut Street, Apt #2' and
+    '12 WALNUT ST 2' give the same key) and then hashed, so voters at the
+    same address share a short, indexable identifier.
+    """
+    normalized = '|'.join([
+        normalize_address_part(street_number),
+        normalize_address_part(street_name),
+        normalize_address_part(apartment_number, drop=UNIT_PREFIXES),
+        (zip_code or '').strip()[:5],
+    ])
+    # 16 hex digits (64 bits) keeps the index small with no practical risk of collisions
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def voter_natural_key(row, fields):
+    """
+    Return the stable key used to match a CSV row to an existing Voter.
+    
+    The town's Voter ID Number is used when the file provides it. Older
+    extracts without that column fall back to name, date of birth and
+    registration date, none of which change when a voter moves.
+    
+    A key longer than the natural_key column (long names) is replaced by
+    its SHA-1 digest, so it still fits and still identifies the voter.
+    """
+    key = (row.get('Voter ID Number') or '').strip()
+    if not key:
+        key = '|'.join([
+            fields['last_name'].upper(),
+            fields['first_name'].upper(),
+            fields['date_of_birth'].isoformat(),
+            fields['date_of_registration'].isoformat(),
+        ])
+    if len(key) > Voter._meta.get_field('natural_key').max_length:
+        key = 'sha1:' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return key
 
 
-def load_data():
+def voter_row_hash(fields):
+    """Return a SHA-1 digest of the parsed field values, used to detect changed rows."""
+    joined = '\x1f'.join(str(fields[name]) for name in VOTER_FIELDS)
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()
+
+
+def read_voter_csv(csv_file_path, duplicates=None):
+    """
+    Yield (natural_key, row_hash, fields) for every row of the voter CSV.
+    
+    Rows whose natural key was already seen earlier in the file are skipped,
+    so each key appears at most once. If `duplicates` is a list, a
+    (line number, natural_key) pair is appended to it for every skipped row.
+    """
+    seen = set()
+    with open(csv_file_path, 'r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            fields = parse_voter_row(row)
+            key = voter_natural_key(row, fields)
+            if key in seen:
+                if duplicates is not None:
+                    duplicates.append((reader.line_num, key))
+                continue
+            seen.add(key)
+            yield key, voter_row_hash(fields), fields
+
+
+def load_data(csv_file_path='newton_voters.csv', incremental=False):
     """
     Load voter data from CSV file into the database.
     Processes newton_voters.csv and creates Voter model instances.
@@ -64,63 +254,134 @@ def load_data():
     4. Calculates voter_score based on election participation
     5. Uses bulk_create for efficient database insertion
     
+    Pass incremental=True to apply the file with sync_data() instead,
+    which only writes the rows that changed since the last load.
     """
-    # Clear existing data
-    Voter.objects.all().delete()
-    
-    # Path to CSV file (adjust path as needed)
-    csv_file_path = 'newton_voters.csv'
+    if incremental:
+        return sync_data(csv_file_path)
     
-    with open(csv_file_path, 'r', encoding='utf-8') as file:
-        csv_reader = csv.DictReader(file)
+    with transaction.atomic():
+        # Clear existing data
+        Voter.objects.all().delete()
         
         voters_to_create = []
+        duplicates = []
         
-        for row in csv_reader:
-            # Parse dates
-            dob = datetime.strptime(row['Date of Birth'], '%Y-%m-%d').date()
-            dor = datetime.strptime(row['Date of Registration'], '%Y-%m-%d').date()
-            
-            # Convert voting history to boolean
-            v20state = row['v20state'].strip().upper() == 'TRUE'
-            v21town = row['v21town'].strip().upper() == 'TRUE'
-            v21primary = row['v21primary'].strip().upper() == 'TRUE'
-            v22general = row['v22general'].strip().upper() == 'TRUE'
-            v23town = row['v23town'].strip().upper() == 'TRUE'
-            
-            # Calculate voter score
-            voter_score = sum([v20state, v21town, v21primary, v22general, v23town])
-            
-            # Create Voter instance
-            voter = Voter(
-                last_name=row['Last Name'].strip(),
-                first_name=row['First Name'].strip(),
-                street_number=row['Residential Address - Street Number'].strip(),
-                street_name=row['Residential Address - Street Name'].strip(),
-                apartment_number=row.get('Residential Address - Apartment Number', '').strip(),
-                zip_code=row['Residential Address - Zip Code'].strip(),
-                date_of_birth=dob,
-                date_of_registration=dor,
-                party_affiliation=row['Party Affiliation'],  # Keep the 2-char field as is
-                precinct_number=row['Precinct Number'].strip(),
-                v20state=v20state,
-                v21town=v21town,
-                v21primary=v21primary,
-                v22general=v22general,
-                v23town=v23town,
-                voter_score=voter_score
-            )
-            
-            voters_to_create.append(voter)
+        for key, row_hash, fields in read_voter_csv(csv_file_path, duplicates):
+            voters_to_create.append(Voter(natural_key=key, row_hash=row_hash, **fields))
             
             # Bulk create every 1000 records for efficiency
-            if len(voters_to_create) >= 1000:
+            if len(voters_to_create) >= BATCH_SIZE:
                 Voter.objects.bulk_create(voters_to_create)
                 voters_to_create = []
         
         # Create remaining voters
         if voters_to_create:
             Voter.objects.bulk_create(voters_to_create)
+        
+        bump_data_version()
     
+    refresh_cached_metadata()
+    refresh_search_index()
     print(f"Successfully loaded {Voter.objects.count()} voters")
+    report_duplicates(duplicates)
+
+
+def sync_data(csv_file_path='newton_voters.csv'):
+    """
+    Incrementally apply a new voter roll to the existing Voter table.
+    
+    Each CSV row is matched to an existing voter by natural_key and compared
+    by row_hash:
+    - rows with an unknown key are inserted
+    - rows whose hash differs are updated in place (same primary key)
+    - voters whose key no longer appears in the file are deleted
+    - unchanged rows are not written at all
+    
+    All writes happen in batches of BATCH_SIZE inside one transaction, so
+    the table stays readable and consistent while the sync runs.
+    
+    Returns:
+        dict: Counts of 'created', 'updated', 'deleted' and 'unchanged' voters,
+        and of 'duplicates' (rows skipped because their key repeated)
+    """
+    # natural_key -> (id, row_hash) for every voter currently stored;
+    # voters loaded before natural keys existed have no key and are replaced
+    existing = {}
+    unkeyed_ids = []
+    for pk, key, row_hash in Voter.objects.values_list('id', 'natural_key', 'row_hash').iterator(chunk_size=BATCH_SIZE):
+        if key is None:
+            unkeyed_ids.append(pk)
+        else:
+            existing[key] = (pk, row_hash)
+    
+    to_create = []
+    to_update = []
+    unchanged = 0
+    duplicates = []
+    
+    for key, row_hash, fields in read_voter_csv(csv_file_path, duplicates):
+        match = existing.pop(key, None)
+        if match is None:
+            to_create.append(Voter(natural_key=key, row_hash=row_hash, **fields))
+        elif match[1] != row_hash:
+            to_update.append(Voter(id=match[0], natural_key=key, row_hash=row_hash, **fields))
+        else:
+            unchanged += 1
+    
+    # anything left in existing was not in the file
+    to_delete = unkeyed_ids + [pk for pk, _ in existing.values()]
+    
+    with transaction.atomic():
+        for start in range(0, len(to_delete), BATCH_SIZE):
+            Voter.objects.filter(id__in=to_delete[start:start + BATCH_SIZE]).delete()
+        if to_update:
+            Voter.objects.bulk_update(to_update, VOTER_FIELDS + ['row_hash'], batch_size=BATCH_SIZE)
+        if to_create:
+            Voter.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        if to_delete or to_update or to_create:
+            bump_data_version()
+    
+    refresh_cached_metadata()
+    refresh_search_index()
+    
+    summary = {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(to_delete),
+        'unchanged': unchanged,
+        'duplicates': len(duplicates),
+    }
+    print(f"Synced voters: {summary['created']} created, {summary['updated']} updated, "
+          f"{summary['deleted']} deleted, {summary['unchanged']} unchanged")
+    report_duplicates(duplicates)
+    return summary
+
+
+# Number of skipped duplicate rows listed individually after a load
+DUPLICATES_SHOWN = 10
+
+
+def report_duplicates(duplicates):
+    """Print how many CSV rows were skipped as duplicates, and the first few of them."""
+    if not duplicates:
+        return
+    print(f"Skipped {len(duplicates)} rows whose voter was already in the file:")
+    for line, key in duplicates[:DUPLICATES_SHOWN]:
+        print(f"  line {line}: {key}")
+    if len(duplicates) > DUPLICATES_SHOWN:
+        print(f"  ... and {len(duplicates) - DUPLICATES_SHOWN} more")
+
+
+def refresh_cached_metadata():
+    """Rebuild the cached filter dropdown metadata after the Voter table changes."""
+    # imported here because metadata.py imports this module
+    from .metadata import refresh_filter_metadata
+    refresh_filter_metadata()
+
 
+def refresh_search_index():
+    """Rebuild the voter name/street search index after the Voter table changes."""
+    # imported here because search.py imports this module
+    from .search import rebuild_search_index
+    rebuild_search_index()
@@ -0,0 +1,208 @@
+# pagination.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Paginators for the voter list: keyset (seek) pagination and a cached-count offset paginator
+
+import base64
+import binascii
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField, CharField, FloatField, IntegerField, Q, TextField
+from django.db.models.expressions import RawSQL
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that uses a count computed elsewhere instead of running COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            # pre-fill the cached_property so Paginator.count never queries
+            self.__dict__['count'] = count
+
+
+def encode_cursor(values):
+    """Encode the ordering values of a row as an opaque URL-safe cursor string."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Returns:
+        tuple: The ordering values, or None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return tuple(values)
+
+
+def cursor_values_match(model, fields, values):
+    """
+    Return True if every cursor value has the type its ordering field stores.
+
+    A cursor is only base64 JSON, so a crafted one can hold objects or
+    lists, or a string where an id belongs; such values must not reach the
+    database as query parameters.
+    """
+    for name, value in zip(fields, values):
+        field = model._meta.get_field(name)
+        if value is None:
+            valid = field.null
+        elif isinstance(field, IntegerField):
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        elif isinstance(field, FloatField):
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        elif isinstance(field, (CharField, TextField)):
+            valid = isinstance(value, str)
+        else:
+            valid = isinstance(value, (str, int, float)) and not isinstance(value, bool)
+        if not valid:
+            return False
+    return True
+
+
+def seek_filter(model, fields, values, forward=True, using='default'):
+    """
+    Build the WHERE clause selecting rows strictly after (or before) a position.
+
+    On SQLite, PostgreSQL and MySQL this is a row-value comparison,
+    (a, b, c) > (x, y, z), which the database answers with a single range
+    seek on the composite index. Other backends get the equivalent
+    a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z).
+    """
+    op = '>' if forward else '<'
+
+    if connections[using].vendor in ('sqlite', 'postgresql', 'mysql'):
+        quote = connections[using].ops.quote_name
+        table = quote(model._meta.db_table)
+        columns = ', '.join(f'{table}.{quote(model._meta.get_field(field).column)}' for field in fields)
+        placeholders = ', '.join(['%s'] * len(values))
+        return RawSQL(f'({columns}) {op} ({placeholders})', values, output_field=BooleanField())
+
+    lookup = 'gt' if forward else 'lt'
+    condition = Q()
+    for i, field in enumerate(fields):
+        term = Q(**{f'{field}__{lookup}': values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            term &= Q(**{prev_field: prev_value})
+        condition |= term
+    return condition
+
+
+class KeysetPage:
+    """One page of results from a KeysetPaginator."""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Keyset (seek) paginator.
+
+    Instead of OFFSET, each page is selected with a WHERE clause on the
+    ordering columns of the last row of the previous page, so fetching a
+    late page costs the same as fetching the first one as long as an index
+    covers `ordering`. The last ordering field must be unique (e.g. 'id').
+
+    The total count is not computed here; pass `count` (e.g. a cached count)
+    if the template needs it.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('last_name', 'first_name', 'id'), count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.count = count
+
+    def cursor_for(self, obj):
+        """Return the cursor pointing at obj's position in the ordering."""
+        return encode_cursor(getattr(obj, field) for field in self.ordering)
+
+    def page(self, after=None, before=None):
+        """
+        Return the page following the `after` cursor, or preceding the `before` cursor.
+
+        With neither cursor (or a malformed one) the first page is returned.
+        """
+        after_values = self.decode(after)
+        before_values = self.decode(before)
+
+        if before_values is not None:
+            return self._page_before(before_values)
+        return self._page_after(after_values)
+
+    def decode(self, cursor):
+        """Decode a cursor for this ordering; None if it is missing, malformed or holds values of the wrong type."""
+        values = decode_cursor(cursor, len(self.ordering))
+        if values is None or not cursor_values_match(self.queryset.model, self.ordering, values):
+            return None
+        return values
+
+    def _page_after(self, values):
+        """Fetch the rows following values (or the first rows when values is None)."""
+        queryset = self.queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(
+                seek_filter(queryset.model, self.ordering, values, forward=True, using=queryset.db)
+            )
+
+        # fetch one extra row to learn whether there is a next page
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        return KeysetPage(
+            rows, self,
+            next_cursor=self.cursor_for(rows[-1]) if has_next else None,
+            previous_cursor=self.cursor_for(rows[0]) if values is not None and rows else None,
+        )
+
+    def _page_before(self, values):
+        """Fetch the rows preceding values, returned in normal order."""
+        descending = [f'-{field}' for field in self.ordering]
+        queryset = self.queryset.order_by(*descending)
+        queryset = queryset.filter(
+            seek_filter(queryset.model, self.ordering, values, forward=False, using=queryset.db)
+        )
+
+        rows = list(queryset[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+
+        return KeysetPage(
+            rows, self,
+            next_cursor=self.cursor_for(rows[-1]) if rows else None,
+            previous_cursor=self.cursor_for(rows[0]) if has_previous else None,
+        )
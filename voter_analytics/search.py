@@ -0,0 +1,331 @@
+# search.py
+# Name: Shuwei Zhu
+# Email: david996@bu.edu
+# Description: Typo-tolerant voter lookup by name and street backed by a SQLite FTS5 trigram index
+
+import re
+from functools import lru_cache
+
+from django.db import connections, models, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Voter
+
+# FTS5 table indexing the searchable Voter columns; rebuilt by the loader
+SEARCH_TABLE = 'voter_analytics_voter_search'
+SEARCH_FIELDS = ('last_name', 'first_name', 'street_name')
+
+# FTS5 table of the distinct words in SEARCH_FIELDS, used to correct typos
+WORDS_TABLE = 'voter_analytics_voter_search_words'
+
+# each dictionary word under itself and every single-letter deletion of it,
+# so words one typo away from a term are found even with no shared trigram
+VARIANTS_TABLE = 'voter_analytics_voter_search_variants'
+
+# rows fetched from the index per query and then re-ranked in Python
+CANDIDATE_LIMIT = 200
+
+# dictionary words considered, and kept, as corrections of a misspelled term
+CORRECTION_CANDIDATES = 500
+MAX_CORRECTIONS = 10
+
+# candidates and corrections scoring below this similarity are dropped
+MIN_SCORE = 0.3
+
+# typos (insertions, deletions, substitutions, swaps) tolerated per word
+MAX_EDIT_DISTANCE = 2
+
+# shortest term the trigram index can match
+MIN_TERM_LENGTH = 3
+
+
+def normalize(text):
+    """Lowercase text and reduce it to words of letters and digits."""
+    return re.sub(r'[^0-9a-z]+', ' ', (text or '').lower()).strip()
+
+
+def query_terms(query):
+    """Split a search query into normalized terms."""
+    return normalize(query).split()
+
+
+def trigrams(word):
+    """Return the set of trigrams of a word, padded like PostgreSQL's pg_trgm."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    """Trigram similarity of two words: shared trigrams over all trigrams (0 to 1)."""
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def deletes(word):
+    """Return the words made by deleting one letter of a word."""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+@lru_cache(maxsize=65536)
+def edit_distance(a, b):
+    """
+    Number of typos between two words, counting a swap of neighbouring letters as one.
+
+    Returns MAX_EDIT_DISTANCE + 1 for anything further apart, which the
+    length difference alone often shows without comparing the letters.
+    """
+    if abs(len(a) - len(b)) > MAX_EDIT_DISTANCE:
+        return MAX_EDIT_DISTANCE + 1
+    # optimal string alignment: Levenshtein plus transpositions, two rows back
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        previous, current, before = current, [i] + [0] * len(b), previous
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > MAX_EDIT_DISTANCE:
+            return MAX_EDIT_DISTANCE + 1
+    return min(current[-1], MAX_EDIT_DISTANCE + 1)
+
+
+@lru_cache(maxsize=65536)
+def word_score(term, word):
+    """
+    Score how well one word matches one query term (0 to 1).
+
+    A word the term is a prefix of scores 1.0. Otherwise the better of the
+    trigram similarity and, within MAX_EDIT_DISTANCE typos, the share of
+    the longer word's letters that need no edit ('garosn' is one swap, or
+    0.83, from 'garson').
+    """
+    if word.startswith(term):
+        return 1.0
+    score = similarity(term, word)
+    distance = edit_distance(term, word)
+    if distance <= MAX_EDIT_DISTANCE:
+        score = max(score, 1 - distance / max(len(term), len(word)))
+    return score
+
+
+def score_match(terms, words):
+    """
+    Score how well a voter's words match the query terms.
+
+    Each term scores its best word_score() against any of the words; the
+    result is the mean over terms.
+    """
+    return sum(max((word_score(term, word) for word in words), default=0.0) for term in terms) / len(terms)
+
+
+def search_index_available(using='default'):
+    """Return True if the FTS5 indexes exist on this database."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    tables = connection.introspection.table_names()
+    return SEARCH_TABLE in tables and WORDS_TABLE in tables and VARIANTS_TABLE in tables
+
+
+def rebuild_search_index(using='default'):
+    """
+    Create the FTS5 trigram indexes if needed and rebuild them from the Voter table.
+
+    SEARCH_TABLE is an external-content table over voter_analytics_voter, so
+    it stores only the trigrams, not a second copy of the names. WORDS_TABLE
+    holds each distinct word once and VARIANTS_TABLE a row per letter of
+    each word; both are small compared to the voter table.
+    Called by the loader after every load; on databases other than SQLite
+    this does nothing and search falls back to substring matching.
+
+    Returns:
+        bool: True if the indexes were rebuilt
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+
+    words = set()
+    for field in SEARCH_FIELDS:
+        for value in Voter.objects.using(using).order_by().values_list(field, flat=True).distinct():
+            words.update(normalize(value).split())
+
+    quote = connection.ops.quote_name
+    columns = ', '.join(SEARCH_FIELDS)
+    # one transaction, so the rows are not committed one statement at a time
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {quote(SEARCH_TABLE)} USING fts5("
+            f"{columns}, content={quote(Voter._meta.db_table)}, content_rowid='id', tokenize='trigram')"
+        )
+        cursor.execute(f"INSERT INTO {quote(SEARCH_TABLE)}({quote(SEARCH_TABLE)}) VALUES ('rebuild')")
+
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {quote(WORDS_TABLE)} USING fts5(word, tokenize='trigram')")
+        cursor.execute(f"DELETE FROM {quote(WORDS_TABLE)}")
+        cursor.executemany(f"INSERT INTO {quote(WORDS_TABLE)}(word) VALUES (%s)", [(word,) for word in sorted(words)])
+
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(VARIANTS_TABLE)} "
+            f"(variant TEXT NOT NULL, word TEXT NOT NULL, PRIMARY KEY (variant, word)) WITHOUT ROWID"
+        )
+        cursor.execute(f"DELETE FROM {quote(VARIANTS_TABLE)}")
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {quote(VARIANTS_TABLE)}(variant, word) VALUES (%s, %s)",
+            [(variant, word) for word in sorted(words) for variant in deletes(word) | {word}],
+        )
+    return True
+
+
+def corrections(term, using='default'):
+    """
+    Return the dictionary words closest to a (possibly misspelled) term.
+
+    Two lookups supply the candidates. VARIANTS_TABLE finds every word one
+    typo away, and some two away, by matching the term and its deletions
+    against the words and their deletions ('jhon' and 'john' both become
+    'jon'); short words like that share no trigram with their misspelling.
+    WORDS_TABLE adds the words sharing the most trigrams with the term.
+    Candidates are ranked by edit distance, then trigram similarity.
+    """
+    quote = connections[using].ops.quote_name
+    variants = sorted(deletes(term) | {term})
+    grams = sorted({term[i:i + 3] for i in range(len(term) - 2)})
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT word FROM {quote(VARIANTS_TABLE)} '
+            f'WHERE variant IN ({", ".join(["%s"] * len(variants))}) LIMIT %s',
+            variants + [CORRECTION_CANDIDATES],
+        )
+        words = {word for (word,) in cursor.fetchall()}
+        cursor.execute(
+            f'SELECT word FROM {quote(WORDS_TABLE)} WHERE {quote(WORDS_TABLE)} MATCH %s ORDER BY rank LIMIT %s',
+            [' OR '.join(f'"{gram}"' for gram in grams), CORRECTION_CANDIDATES],
+        )
+        words.update(word for (word,) in cursor.fetchall())
+
+    scored = [(edit_distance(term, word), similarity(term, word), word) for word in words]
+    scored = [item for item in scored if item[0] <= MAX_EDIT_DISTANCE or item[1] >= MIN_SCORE]
+    scored.sort(key=lambda item: (item[0], -item[1], item[2]))
+    return [word for _, _, word in scored[:MAX_CORRECTIONS]]
+
+
+def prefix_words(term, using='default'):
+    """Return up to MAX_CORRECTIONS dictionary words that start with a short term."""
+    table = connections[using].ops.quote_name(WORDS_TABLE)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'SELECT word FROM {table} WHERE word LIKE %s AND length(word) >= %s LIMIT %s',
+            [f'{term}%', MIN_TERM_LENGTH, MAX_CORRECTIONS],
+        )
+        return [word for (word,) in cursor.fetchall()]
+
+
+def match_query(alternatives):
+    """
+    Build an FTS5 query from a list of alternatives per term.
+
+    Each term matches if any of its alternatives appears as a substring;
+    every term must match.
+    """
+    return ' AND '.join(
+        '(' + ' OR '.join(f'"{word}"' for word in words) + ')' for words in alternatives
+    )
+
+
+def index_candidates(match, limit, queryset=None, using='default'):
+    """
+    Return up to `limit` voter ids matching an FTS5 query.
+
+    If `queryset` is given, only voters in it are considered, so the limit
+    is applied after the filters rather than before them. Each match is
+    checked against the filters by primary key as the index yields it, and
+    the scan stops at `limit`, so neither the filtered voters nor the
+    matches are ever collected or sorted as a whole; candidates are ranked
+    by search_voters() afterwards.
+    """
+    table = connections[using].ops.quote_name(SEARCH_TABLE)
+    sql = f'SELECT rowid FROM {table} WHERE {table} MATCH %s'
+    params = [match]
+    if queryset is not None:
+        # the filtered queryset, narrowed to the current match's row
+        matched = queryset.filter(id=RawSQL(f'{table}.rowid', (), output_field=models.BigIntegerField()))
+        subquery, subquery_params = matched.order_by().values('id').query.get_compiler(using=using).as_sql()
+        sql += f' AND EXISTS ({subquery})'
+        params.extend(subquery_params)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'{sql} LIMIT %s', params + [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def substring_candidates(terms, limit, queryset=None, using='default'):
+    """Return up to `limit` voter ids (from `queryset` if given) containing every term, without the index."""
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for field in SEARCH_FIELDS:
+            term_condition |= Q(**{f'{field}__icontains': term})
+        condition &= term_condition
+    voters = Voter.objects.using(using) if queryset is None else queryset
+    return list(voters.filter(condition).order_by().values_list('id', flat=True)[:limit])
+
+
+def search_voters(query, limit=20, queryset=None, using='default'):
+    """
+    Find voters by partial, possibly misspelled, name or street.
+
+    Candidates come from the FTS5 trigram index: first voters containing
+    every term exactly, then (if that finds too few) voters containing the
+    closest dictionary words to each term. Candidates are re-ranked by
+    edit distance and trigram similarity to the query (see word_score).
+    If `queryset` is given, candidates are drawn only from it, so filtered
+    searches find matches beyond the first CANDIDATE_LIMIT voters of the
+    whole table.
+
+    Args:
+        query (str): Text typed by the user, e.g. 'jonh walnut'
+        limit (int): Maximum number of voters returned
+        queryset (QuerySet): Optional filtered Voter queryset to search within
+
+    Returns:
+        list: (Voter, score) pairs, best match first
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    searchable = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    if not search_index_available(using):
+        ids = substring_candidates(terms, CANDIDATE_LIMIT, queryset, using)
+    elif searchable:
+        ids = index_candidates(match_query([[term] for term in searchable]), CANDIDATE_LIMIT, queryset, using)
+        if len(ids) < CANDIDATE_LIMIT:
+            alternatives = [corrections(term, using) for term in searchable]
+            if all(alternatives):
+                seen = set(ids)
+                for pk in index_candidates(match_query(alternatives), CANDIDATE_LIMIT, queryset, using):
+                    if pk not in seen:
+                        ids.append(pk)
+                        seen.add(pk)
+    else:
+        # only one- or two-letter terms, too short for the trigram index:
+        # expand each to dictionary words starting with it
+        alternatives = [prefix_words(term, using) for term in terms]
+        ids = (index_candidates(match_query(alternatives), CANDIDATE_LIMIT, queryset, using)
+               if all(alternatives) else [])
+
+    # the candidates are already restricted to `queryset`; load them by id
+    voters = Voter.objects.using(using).filter(id__in=ids).order_by()
+
+    results = []
+    for voter in voters:
+        words = normalize(' '.join(getattr(voter, field) for field in SEARCH_FIELDS)).split()
+        score = score_match(terms, words)
+        if score >= MIN_SCORE:
+            results.append((voter, score))
+
+    results.sort(key=lambda item: (-item[1], item[0].last_name, item[0].first_name, item[0].id))
+    return results[:limit]
@@ -1,3 +1,163 @@
 from django.test import TestCase
 
 # Create your tests here.
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date
+
+from .models import Voter, load_data, sync_data
+from .pagination import KeysetPaginator, encode_cursor
+from .search import corrections, edit_distance, rebuild_search_index, search_voters
+
+
+def make_voter(first_name, last_name, **fields):
+    """Create a Voter with placeholder address and registration details."""
+    values = {
+        'street_number': '1', 'street_name': 'Walnut St', 'zip_code': '02460',
+        'date_of_birth': date(1980, 1, 1), 'date_of_registration': date(2000, 1, 1),
+        'party_affiliation': 'D ', 'precinct_number': '1',
+    }
+    values.update(fields)
+    return Voter.objects.create(first_name=first_name, last_name=last_name, **values)
+
+
+def raw_cursor(values):
+    """Encode any JSON value as a cursor, the way a visitor could craft one."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+class KeysetCursorTests(TestCase):
+    """Cursors from the query string are checked before they reach the database."""
+
+    ordering = ('last_name', 'first_name', 'id')
+
+    def setUp(self):
+        for n in range(5):
+            make_voter(f'First{n}', f'Last{n}')
+        self.paginator = KeysetPaginator(Voter.objects.all(), 2, ordering=self.ordering)
+
+    def names(self, page):
+        return [voter.last_name for voter in page.object_list]
+
+    def test_valid_cursor_seeks_past_the_position(self):
+        first = self.paginator.page()
+        second = self.paginator.page(after=first.next_cursor)
+        self.assertEqual(self.names(second), ['Last2', 'Last3'])
+
+    def test_cursor_with_wrongly_typed_values_returns_first_page(self):
+        voter = Voter.objects.get(last_name='Last2')
+        bad_cursors = [
+            raw_cursor([{}, {}, {}]),
+            raw_cursor([[], [], []]),
+            raw_cursor(['Last2', 'First2', str(voter.pk)]),
+            raw_cursor(['Last2', 'First2', True]),
+            raw_cursor([2, 'First2', voter.pk]),
+            raw_cursor([None, 'First2', voter.pk]),
+        ]
+        for cursor in bad_cursors:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.names(self.paginator.page(after=cursor)), ['Last0', 'Last1'])
+                self.assertEqual(self.names(self.paginator.page(before=cursor)), ['Last0', 'Last1'])
+
+    def test_encoded_position_is_accepted(self):
+        voter = Voter.objects.get(last_name='Last2')
+        cursor = encode_cursor([voter.last_name, voter.first_name, voter.pk])
+        self.assertEqual(self.names(self.paginator.page(after=cursor)), ['Last3', 'Last4'])
+
+
+class VoterSearchTests(TestCase):
+    """Searches find voters through typos, including ones that share no trigram with the right word."""
+
+    def setUp(self):
+        self.john = make_voter('John', 'Smith', street_name='Walnut St')
+        self.jane = make_voter('Jane', 'Brown', street_name='Beacon St')
+        self.garson = make_voter('Anna', 'Garson', street_name='Elm St')
+        self.gargaror = make_voter('Ben', 'Gargaror', street_name='Oak St')
+        make_voter('Carl', 'Whitman', street_name='Cedar St')
+        rebuild_search_index()
+
+    def best_match(self, query, **kwargs):
+        results = search_voters(query, **kwargs)
+        return results[0][0] if results else None
+
+    def test_typos_find_the_voter(self):
+        for query, voter in [('jonh walnut', self.john), ('jhon', self.john), ('smth', self.john),
+                             ('smth walnt', self.john), ('brwon', self.jane)]:
+            with self.subTest(query=query):
+                self.assertEqual(self.best_match(query), voter)
+
+    def test_typos_within_a_filtered_queryset(self):
+        queryset = Voter.objects.filter(street_name='Walnut St')
+        self.assertEqual(self.best_match('smth walnt', queryset=queryset), self.john)
+
+    def test_swapped_letters_rank_above_shared_trigrams(self):
+        results = [voter for voter, score in search_voters('Garosn')]
+        self.assertEqual(results[0], self.garson)
+        self.assertEqual(corrections('garosn')[0], 'garson')
+
+    def test_edit_distance_counts_swaps_as_one_typo(self):
+        self.assertEqual(edit_distance('garosn', 'garson'), 1)
+        self.assertEqual(edit_distance('smth', 'smith'), 1)
+        self.assertEqual(edit_distance('jonh', 'john'), 1)
+        self.assertEqual(edit_distance('walnut', 'walnut'), 0)
+        self.assertEqual(edit_distance('ab', 'abcdef'), 3)
+
+
+CSV_COLUMNS = [
+    'Last Name', 'First Name', 'Residential Address - Street Number', 'Residential Address - Street Name',
+    'Residential Address - Apartment Number', 'Residential Address - Zip Code', 'Date of Birth',
+    'Date of Registration', 'Party Affiliation', 'Precinct Number',
+    'v20state', 'v21town', 'v21primary', 'v22general', 'v23town',
+]
+
+
+def csv_row(first_name, last_name, street_number='1'):
+    """Return one voter CSV row; voters with the same name share a natural key."""
+    return [last_name, first_name, street_number, 'Walnut St', '', '02460', '1980-01-01',
+            '2000-01-01', 'D ', '1', 'TRUE', 'FALSE', 'FALSE', 'TRUE', 'FALSE']
+
+
+class LoadDataTests(TestCase):
+    """Loading the voter CSV reports skipped rows and stores keys that fit their column."""
+
+    def write_csv(self, rows):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(rows)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_duplicate_rows_are_counted_and_reported(self):
+        path = self.write_csv([csv_row('John', 'Smith'), csv_row('Jane', 'Brown'),
+                               csv_row('John', 'Smith', street_number='2')])
+        output = io.StringIO()
+        with redirect_stdout(output):
+            summary = sync_data(path)
+        self.assertEqual(summary['created'], 2)
+        self.assertEqual(summary['duplicates'], 1)
+        self.assertIn('Skipped 1 rows', output.getvalue())
+        self.assertIn('line 4: SMITH|JOHN|1980-01-01|2000-01-01', output.getvalue())
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            load_data(path)
+        self.assertIn('Skipped 1 rows', output.getvalue())
+        self.assertEqual(Voter.objects.count(), 2)
+
+    def test_long_fallback_key_is_hashed_to_fit(self):
+        long_name = 'Wolfeschlegelsteinhausenbergerdorff' * 3
+        path = self.write_csv([csv_row('Hubert', long_name)])
+        with redirect_stdout(io.StringIO()):
+            sync_data(path)
+            summary = sync_data(path)
+        key = Voter.objects.get().natural_key
+        self.assertTrue(key.startswith('sha1:'))
+        self.assertLessEqual(len(key), Voter._meta.get_field('natural_key').max_length)
+        self.assertEqual(summary['unchanged'], 1)
@@ -7,5 +7,13 @@ app_name = 'voter_analytics'
 urlpatterns = [
     path('', views.VoterListView.as_view(), name='voters'),
     path('voter/<int:pk>/', views.VoterDetailView.as_view(), name='voter'),
+    path('household/<str:household_id>/', views.HouseholdView.as_view(), name='household'),
     path('graphs/', views.VoterGraphsView.as_view(), name='graphs'),
+    path('graphs/data/', views.VoterGraphDataView.as_view(), name='graph_data'),
+    path('search/', views.VoterSearchView.as_view(), name='search'),
+    path('export/', views.VoterExportView.as_view(), name='export'),
+    path('precincts/', views.PrecinctAnalyticsView.as_view(), name='precincts'),
+    path('api/precincts/', views.PrecinctAnalyticsDataView.as_view(), name='precincts_api'),
+    path('api/transitions/', views.TurnoutTransitionDataView.as_view(), name='transitions_api'),
+    path('api/household/<str:household_id>/', views.HouseholdDataView.as_view(), name='household_api'),
 ]
\ No newline at end of file
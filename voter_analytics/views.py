@@ -3,13 +3,39 @@
 # Email: david996@bu.edu
 # Description: Views for voter analytics application including list, detail, and graph views
 
-from django.views.generic import ListView, DetailView
-from django.db.models import Q, Count
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.views.generic import ListView, DetailView, TemplateView, View
 from .models import Voter
-import plotly.graph_objs as go
-import plotly.offline as pyo
+from .analytics import get_precinct_stats, household_members, household_summary
+from .export import columnar_stream, csv_stream, export_rows, gzip_stream
+from .filters import VoterFilter
+from .graphs import get_figures_json
+from .metadata import filter_choices
+from .pagination import CachedCountPaginator, KeysetPage, KeysetPaginator
+from .search import search_voters
 
-class VoterListView(ListView):
+# most results returned by the autocomplete endpoint
+AUTOCOMPLETE_MAX_RESULTS = 50
+
+# export formats: ?format= value -> (encoder, content type, file extension)
+EXPORT_FORMATS = {
+    'csv': (csv_stream, 'text/csv', 'csv'),
+    'columnar': (columnar_stream, 'application/octet-stream', 'vcol'),
+}
+
+
+class VoterFilterMixin:
+    """Parse the voter filter GET parameters once per request."""
+    
+    @cached_property
+    def voter_filter(self):
+        """The VoterFilter selected by this request's GET parameters."""
+        return VoterFilter.from_query_params(self.request.GET)
+
+
+class VoterListView(VoterFilterMixin, ListView):
     """
     View to display a paginated list of voters with filtering capabilities.
     
@@ -18,11 +44,24 @@ class VoterListView(ListView):
     - Supports filtering by party affiliation, birth year range, voter score, and voting history
     - Preserves filter selections when navigating between pages
     - Shows voter name, address, DOB, party affiliation, and voter score
+    
+    Pages are selected with keyset pagination (?after=/?before= cursors on
+    last name, first name, id), so late pages are as fast as the first one.
+    Requests with a ?page= number still use offset pagination.
+    
+    A ?q= search (partial or misspelled name or street) replaces the list
+    with the best matching voters, ranked by similarity (see search.py).
     """
     model = Voter
     template_name = 'voter_analytics/voter_list.html'
     context_object_name = 'voters'
     paginate_by = 100
+    keyset_ordering = ('last_name', 'first_name', 'id')
+    
+    @cached_property
+    def search_query(self):
+        """The name/street search typed by the user, or '' when not searching."""
+        return self.request.GET.get('q', '').strip()
     
     def get_queryset(self):
         """
@@ -34,40 +73,41 @@ class VoterListView(ListView):
         Returns:
             QuerySet: Filtered voter records
         """
-        queryset = super().get_queryset()
-        
-        # Get filter parameters
-        party = self.request.GET.get('party_affiliation')
-        min_dob_year = self.request.GET.get('min_dob_year')
-        max_dob_year = self.request.GET.get('max_dob_year')
-        voter_score = self.request.GET.get('voter_score')
-        
-        # Apply filters
-        if party:
-            queryset = queryset.filter(party_affiliation=party)
-        
-        if min_dob_year:
-            queryset = queryset.filter(date_of_birth__year__gte=int(min_dob_year))
-        
-        if max_dob_year:
-            queryset = queryset.filter(date_of_birth__year__lte=int(max_dob_year))
-        
-        if voter_score:
-            queryset = queryset.filter(voter_score=int(voter_score))
-        
-        # Check for specific election filters
-        if self.request.GET.get('v20state'):
-            queryset = queryset.filter(v20state=True)
-        if self.request.GET.get('v21town'):
-            queryset = queryset.filter(v21town=True)
-        if self.request.GET.get('v21primary'):
-            queryset = queryset.filter(v21primary=True)
-        if self.request.GET.get('v22general'):
-            queryset = queryset.filter(v22general=True)
-        if self.request.GET.get('v23town'):
-            queryset = queryset.filter(v23town=True)
+        return self.voter_filter.apply(super().get_queryset())
+    
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        """Use the cached count for these filters instead of a COUNT(*) per page view."""
+        return CachedCountPaginator(
+            queryset, per_page, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            count=self.voter_filter.count(), **kwargs
+        )
+    
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginate with cursors unless the request asks for a page number.
         
-        return queryset
+        Returns:
+            tuple: (paginator, page, object_list, is_paginated) as expected by ListView
+        """
+        if self.search_query:
+            # ranked search results are shown on a single page
+            results = search_voters(self.search_query, limit=page_size, queryset=queryset)
+            return (None, None, [voter for voter, score in results], False)
+        
+        if self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            return super().paginate_queryset(queryset.order_by(*self.keyset_ordering), page_size)
+        
+        paginator = KeysetPaginator(
+            queryset, page_size,
+            ordering=self.keyset_ordering,
+            count=self.voter_filter.count(),
+        )
+        page = paginator.page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
     
     def get_context_data(self, **kwargs):
         """
@@ -81,21 +121,19 @@ class VoterListView(ListView):
         """
         context = super().get_context_data(**kwargs)
         
-        # Get distinct values for dropdowns
-        context['parties'] = Voter.objects.values_list('party_affiliation', flat=True).distinct().order_by('party_affiliation')
-        context['years'] = range(1900, 2025)
-        context['voter_scores'] = range(6)
+        # Get dropdown options from the cached filter metadata
+        context.update(filter_choices())
+        
+        # Total matching voters (cached per filter) and which page links to render
+        if self.search_query:
+            context['voter_count'] = len(context['voters'])
+        else:
+            context['voter_count'] = self.voter_filter.count()
+        context['search_query'] = self.search_query
+        context['keyset_pagination'] = isinstance(context.get('page_obj'), KeysetPage)
         
         # Preserve filter values
-        context['selected_party'] = self.request.GET.get('party_affiliation', '')
-        context['selected_min_year'] = self.request.GET.get('min_dob_year', '')
-        context['selected_max_year'] = self.request.GET.get('max_dob_year', '')
-        context['selected_voter_score'] = self.request.GET.get('voter_score', '')
-        context['v20state_checked'] = 'v20state' in self.request.GET
-        context['v21town_checked'] = 'v21town' in self.request.GET
-        context['v21primary_checked'] = 'v21primary' in self.request.GET
-        context['v22general_checked'] = 'v22general' in self.request.GET
-        context['v23town_checked'] = 'v23town' in self.request.GET
+        context.update(self.voter_filter.selected_context())
         
         return context
 
@@ -109,219 +147,263 @@ class VoterDetailView(DetailView):
     - Address details with Google Maps integration
     - Complete voting history for all 5 elections
     - Registration date and precinct information
+    - Other voters in the same household
     """
     model = Voter
     template_name = 'voter_analytics/voter_detail.html'
     context_object_name = 'voter'
+    
+    def get_context_data(self, **kwargs):
+        """
+        Add the voter's housemates to the context.
+        
+        Housemates are found with one query on the indexed household_id.
+        
+        Returns:
+            dict: Context data including 'housemates'
+        """
+        context = super().get_context_data(**kwargs)
+        voter = self.object
+        context['housemates'] = [
+            member for member in household_members(voter.household_id) if member.pk != voter.pk
+        ] if voter.household_id else []
+        return context
 
 
-class VoterGraphsView(ListView):
+class VoterGraphsView(VoterFilterMixin, TemplateView):
     """
     View to display graphs analyzing voter data with filtering capabilities.
     
-    Creates three interactive Plotly graphs:
+    Shows five interactive Plotly graphs:
     1. Histogram of voter distribution by birth year
     2. Pie chart of voter distribution by party affiliation
     3. Bar chart of voter participation by election
+    4. Bar chart of voters by participation pattern across the 5 elections
+    5. Heatmap of turnout retention between each pair of elections
     
     Uses the same filtering system as VoterListView to allow
-    analysis of specific voter segments.
+    analysis of specific voter segments. The page itself only renders the
+    filter form; the figures are fetched from VoterGraphDataView and drawn
+    in the browser.
     """
-    model = Voter
     template_name = 'voter_analytics/graphs.html'
-    context_object_name = 'voters'
-    
-    def get_queryset(self):
-        """Apply filters based on form input (same as VoterListView)"""
-        queryset = super().get_queryset()
-        
-        # Get filter parameters
-        party = self.request.GET.get('party_affiliation')
-        min_dob_year = self.request.GET.get('min_dob_year')
-        max_dob_year = self.request.GET.get('max_dob_year')
-        voter_score = self.request.GET.get('voter_score')
-        
-        # Apply filters
-        if party:
-            queryset = queryset.filter(party_affiliation=party)
-        
-        if min_dob_year:
-            queryset = queryset.filter(date_of_birth__year__gte=int(min_dob_year))
-        
-        if max_dob_year:
-            queryset = queryset.filter(date_of_birth__year__lte=int(max_dob_year))
-        
-        if voter_score:
-            queryset = queryset.filter(voter_score=int(voter_score))
-        
-        # Check for specific election filters
-        if self.request.GET.get('v20state'):
-            queryset = queryset.filter(v20state=True)
-        if self.request.GET.get('v21town'):
-            queryset = queryset.filter(v21town=True)
-        if self.request.GET.get('v21primary'):
-            queryset = queryset.filter(v21primary=True)
-        if self.request.GET.get('v22general'):
-            queryset = queryset.filter(v22general=True)
-        if self.request.GET.get('v23town'):
-            queryset = queryset.filter(v23town=True)
-        
-        return queryset
     
     def get_context_data(self, **kwargs):
         """
-        Generate graphs and add to context.
-        
-        Creates three graphs based on the filtered voter data and adds
-        them to the template context as HTML div elements. Also includes
-        filter form data to maintain consistency with the list view.
+        Add filter form data to context.
         
         Returns:
-            dict: Context data including graph HTML and filter options
+            dict: Context data including filter options and selected values
         """
         context = super().get_context_data(**kwargs)
         
-        # Get filtered queryset
-        voters = self.get_queryset()
-        
-        # Create graphs
-        context['birth_year_graph'] = self.create_birth_year_histogram(voters)
-        context['party_graph'] = self.create_party_pie_chart(voters)
-        context['election_graph'] = self.create_election_histogram(voters)
-        
         # Add filter form data
-        context['parties'] = Voter.objects.values_list('party_affiliation', flat=True).distinct().order_by('party_affiliation')
-        context['years'] = range(1900, 2025)
-        context['voter_scores'] = range(6)
+        context.update(filter_choices())
         
         # Preserve filter values
-        context['selected_party'] = self.request.GET.get('party_affiliation', '')
-        context['selected_min_year'] = self.request.GET.get('min_dob_year', '')
-        context['selected_max_year'] = self.request.GET.get('max_dob_year', '')
-        context['selected_voter_score'] = self.request.GET.get('voter_score', '')
-        context['v20state_checked'] = 'v20state' in self.request.GET
-        context['v21town_checked'] = 'v21town' in self.request.GET
-        context['v21primary_checked'] = 'v21primary' in self.request.GET
-        context['v22general_checked'] = 'v22general' in self.request.GET
-        context['v23town_checked'] = 'v23town' in self.request.GET
+        context.update(self.voter_filter.selected_context())
         
         return context
+
+
+class VoterGraphDataView(VoterFilterMixin, View):
+    """
+    Return the graphs for the filtered voters as Plotly figure JSON.
     
-    def create_birth_year_histogram(self, voters):
-        """
-        Create histogram of voter distribution by birth year.
-        
-        Args:
-            voters (QuerySet): Filtered voter records
-            
-        Returns:
-            str: HTML div containing the Plotly histogram
-        """
-        # Get birth year counts
-        birth_years = voters.values_list('date_of_birth__year', flat=True)
-        year_counts = {}
-        for year in birth_years:
-            year_counts[year] = year_counts.get(year, 0) + 1
-        
-        # Sort years
-        sorted_years = sorted(year_counts.keys())
-        
-        # Create histogram
-        fig = go.Figure(data=[
-            go.Bar(
-                x=sorted_years,
-                y=[year_counts[year] for year in sorted_years],
-                marker_color='rgb(55, 83, 251)'
-            )
-        ])
-        
-        fig.update_layout(
-            title=f'Voter distribution by Year of Birth (n={len(voters)})',
-            xaxis_title='Year of Birth',
-            yaxis_title='Number of Voters',
-            showlegend=False,
-            height=500
-        )
-        
-        return pyo.plot(fig, output_type='div', include_plotlyjs=False)
+    Accepts the same GET parameters as VoterGraphsView. Serialized figures
+    are cached per filter (see graphs.get_figures_json).
+    """
+    
+    def get(self, request, *args, **kwargs):
+        """Return the cached figure JSON for this request's filters."""
+        return HttpResponse(get_figures_json(self.voter_filter), content_type='application/json')
+
+
+class TurnoutTransitionDataView(VoterFilterMixin, View):
+    """
+    Return participation patterns and election-to-election transitions as JSON.
+    
+    Accepts the same GET parameters as VoterGraphsView; results are cached
+    per filter (see VoterFilter.turnout_transitions).
+    """
+    
+    def get(self, request, *args, **kwargs):
+        """Return the cached transition analysis for this request's filters."""
+        return JsonResponse(self.voter_filter.turnout_transitions())
+
+
+class VoterExportView(VoterFilterMixin, View):
+    """
+    Download the voters matching the list filters.
     
-    def create_party_pie_chart(self, voters):
+    Accepts the same GET parameters as VoterListView, plus:
+    - format: 'csv' (default) or 'columnar' (see export.columnar_stream)
+    - compress: 'gzip' to compress the download on the fly
+    
+    Rows are streamed from a database cursor in fixed-size chunks, so memory
+    use stays constant regardless of how many voters are exported.
+    """
+    
+    def get(self, request, *args, **kwargs):
+        """Stream every matching voter in the requested format."""
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f'Unknown export format: {export_format}')
+        encoder, content_type, extension = EXPORT_FORMATS[export_format]
+        
+        stream = encoder(export_rows(self.voter_filter.queryset()))
+        filename = f'voters.{extension}'
+        
+        if request.GET.get('compress') == 'gzip':
+            stream = gzip_stream(stream)
+            content_type = 'application/gzip'
+            filename += '.gz'
+        
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class PrecinctAnalyticsView(TemplateView):
+    """
+    View to display turnout analytics for every precinct.
+    
+    For each precinct shows the number of voters, turnout rate in each of
+    the 5 elections, mean voter score, party mix and age distribution.
+    Statistics come from analytics.get_precinct_stats(), which is computed
+    once per data load.
+    """
+    template_name = 'voter_analytics/precincts.html'
+    
+    def get_context_data(self, **kwargs):
         """
-        Create pie chart of voter distribution by party affiliation.
-        
-        Shows the percentage breakdown of voters by party, useful for
-        understanding the political composition of the filtered voter set.
+        Add the precinct statistics, shaped into table rows, to the context.
         
-        Args:
-            voters (QuerySet): Filtered voter records
-            
         Returns:
-            str: HTML div containing the Plotly pie chart
+            dict: Context data including the column labels and one row per precinct
         """
-        # Get party counts
-        party_counts = voters.values('party_affiliation').annotate(count=Count('id')).order_by('-count')
-        
-        labels = []
-        values = []
-        for item in party_counts:
-            labels.append(item['party_affiliation'])
-            values.append(item['count'])
-        
-        # Create pie chart
-        fig = go.Figure(data=[
-            go.Pie(
-                labels=labels,
-                values=values,
-                textinfo='label+percent',
-                textposition='auto'
-            )
-        ])
-        
-        fig.update_layout(
-            title=f'Voter distribution by Party Affiliation (n={len(voters)})',
-            height=500
-        )
-        
-        return pyo.plot(fig, output_type='div', include_plotlyjs=False)
+        context = super().get_context_data(**kwargs)
+        stats = get_precinct_stats()
+        
+        rows = []
+        for precinct in stats['precincts']:
+            total = precinct['voters']
+            rows.append({
+                'precinct': precinct['precinct'],
+                'voters': total,
+                'mean_voter_score': precinct['mean_voter_score'],
+                'turnout': [precinct['turnout'][election] * 100 for election in stats['elections']],
+                'party_mix': [
+                    (party, count * 100 / total)
+                    for party, count in sorted(precinct['party_mix'].items(), key=lambda item: -item[1])
+                ],
+                'age_distribution': [
+                    precinct['age_distribution'][band] * 100 / total for band in stats['age_bands']
+                ],
+            })
+        
+        context['elections'] = stats['elections']
+        context['age_bands'] = stats['age_bands']
+        context['precincts'] = rows
+        return context
+
+
+class PrecinctAnalyticsDataView(View):
+    """Return the per-precinct analytics as JSON (see analytics.compute_precinct_stats)."""
+    
+    def get(self, request, *args, **kwargs):
+        """Return the cached precinct statistics."""
+        return JsonResponse(get_precinct_stats())
+
+
+class VoterSearchView(VoterFilterMixin, View):
+    """
+    Autocomplete endpoint: voters matching a partial name or street as JSON.
+    
+    GET parameters:
+    - q: the text typed so far (typos are tolerated)
+    - limit: number of results (default 10, at most AUTOCOMPLETE_MAX_RESULTS)
+    - any of the voter list filters, to search within the filtered voters
+    """
+    
+    def get(self, request, *args, **kwargs):
+        """Return the best matching voters, most similar first."""
+        query = request.GET.get('q', '').strip()
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), AUTOCOMPLETE_MAX_RESULTS)
+        except ValueError:
+            limit = 10
+        
+        results = search_voters(query, limit=limit, queryset=self.voter_filter.queryset())
+        return JsonResponse({
+            'query': query,
+            'results': [
+                {
+                    'id': voter.pk,
+                    'name': f'{voter.first_name} {voter.last_name}',
+                    'address': f'{voter.street_number} {voter.street_name}',
+                    'score': round(score, 3),
+                    'url': reverse('voter_analytics:voter', args=[voter.pk]),
+                }
+                for voter, score in results
+            ],
+        })
+
+
+class HouseholdView(TemplateView):
+    """
+    View to display every voter registered at one address, with household turnout.
+    """
+    template_name = 'voter_analytics/household.html'
     
-    def create_election_histogram(self, voters):
+    def get_context_data(self, **kwargs):
         """
-        Create histogram of voter participation by election.
+        Add the household members and their turnout summary to the context.
         
-        Shows how many voters participated in each of the 5 elections,
-        helping identify which elections had higher turnout among the
-        filtered voter group.
-        
-        Args:
-            voters (QuerySet): Filtered voter records
-            
         Returns:
-            str: HTML div containing the Plotly bar chart
+            dict: Context data including 'members', 'summary' and 'elections'
         """
-        # Count participation in each election
-        election_data = {
-            'v20state': voters.filter(v20state=True).count(),
-            'v21town': voters.filter(v21town=True).count(),
-            'v21primary': voters.filter(v21primary=True).count(),
-            'v22general': voters.filter(v22general=True).count(),
-            'v23town': voters.filter(v23town=True).count()
-        }
-        
-        # Create histogram
-        fig = go.Figure(data=[
-            go.Bar(
-                x=list(election_data.keys()),
-                y=list(election_data.values()),
-                marker_color='rgb(55, 83, 251)'
-            )
-        ])
-        
-        fig.update_layout(
-            title=f'Vote Count by Election (n={len(voters)})',
-            xaxis_title='Election',
-            yaxis_title='Number of Voters',
-            showlegend=False,
-            height=500
-        )
-        
-        return pyo.plot(fig, output_type='div', include_plotlyjs=False)
\ No newline at end of file
+        context = super().get_context_data(**kwargs)
+        members = household_members(self.kwargs['household_id'])
+        if not members:
+            raise Http404('No voters in this household')
+        
+        summary = household_summary(members)
+        context['members'] = members
+        context['summary'] = summary
+        context['address'] = members[0]
+        context['turnout'] = [(election, rate * 100) for election, rate in summary['turnout'].items()]
+        return context
+
+
+class HouseholdDataView(View):
+    """Return the members and turnout of one household as JSON."""
+    
+    def get(self, request, *args, **kwargs):
+        """Return the household, or 404 if no voter has this household_id."""
+        household_id = kwargs['household_id']
+        members = household_members(household_id)
+        if not members:
+            raise Http404('No voters in this household')
+        
+        first = members[0]
+        return JsonResponse({
+            'household_id': household_id,
+            'address': {
+                'street_number': first.street_number,
+                'street_name': first.street_name,
+                'apartment_number': first.apartment_number,
+                'zip_code': first.zip_code,
+            },
+            'members': [
+                {
+                    'id': voter.pk,
+                    'name': f'{voter.first_name} {voter.last_name}',
+                    'party_affiliation': voter.party_affiliation,
+                    'voter_score': voter.voter_score,
+                    'url': reverse('voter_analytics:voter', args=[voter.pk]),
+                }
+                for voter in members
+            ],
+            **household_summary(members),
+        })